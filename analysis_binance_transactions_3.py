@@ -6,14 +6,41 @@
 新增功能：从本地BTC价格文件获取比特币价格数据，并保存为pyfolio格式
 """
 
+import os
 import pandas as pd
 import numpy as np
+import matplotlib
+# 批处理时使用非交互式后端，设置SHOW_PLOTS环境变量时才弹出图表窗口
+if not os.environ.get('SHOW_PLOTS'):
+    matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 import seaborn as sns
 from typing import Dict, List, Tuple, Optional
 import logging
+import csv
+import hashlib
+import itertools
 from datetime import datetime, timezone, timedelta
 import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:  # numba为可选依赖，不可用时使用纯NumPy实现
+    NUMBA_AVAILABLE = False
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:  # pyarrow为可选依赖，不可用时使用pandas默认的CSV读写
+    PYARROW_AVAILABLE = False
+
+# 图表样式只需在导入时设置一次（所有子图默认显示网格，布局由constrained_layout负责）
+plt.style.use('seaborn-v0_8')
+plt.rcParams.update({'axes.grid': True, 'figure.autolayout': False})
 
 # 配置日志 - 输出到文件和控制台
 log_format = '%(asctime)s - %(levelname)s - %(message)s'
@@ -27,8 +54,238 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# 忽略警告
-warnings.filterwarnings('ignore')
+# 跟踪的资产（主账户和Spot Lead账户相同）
+ASSET_LIST = ['USDT', 'BTC', 'BNB', 'ETH', 'SOL', 'BUSD', 'USD']
+
+# 资产价格估算表（用于非BTC资产）
+PRICE_ESTIMATES = {
+    'USDT': 1.0,
+    'BUSD': 1.0,
+    'USD': 1.0,
+    'ETH': 3000.0,
+    'BNB': 300.0,
+    'SOL': 100.0,
+    'ADA': 0.5,
+    'DOT': 10.0,
+    'LINK': 15.0,
+    'AVAX': 30.0,
+    'UNI': 6.0,
+    'ATOM': 10.0,
+    'MATIC': 0.5,
+    'XRP': 0.5,
+    'LTC': 70.0,
+    'BCH': 250.0,
+    'DOGE': 0.08
+}
+
+# 估算价格表（资产名称为索引），未列出的资产按1.0估算
+PRICE_TABLE = pd.Series(PRICE_ESTIMATES, dtype=np.float64)
+
+# 与ASSET_LIST对齐的估算价格向量
+PRICE_VEC = PRICE_TABLE.reindex(ASSET_LIST, fill_value=1.0).to_numpy()
+
+# 资产名称到ASSET_LIST下标的映射
+ASSET_CODES = {asset: code for code, asset in enumerate(ASSET_LIST)}
+
+# 计入资产余额变化的操作类型
+VALID_OPERATIONS = [
+    'Transaction Buy', 'Transaction Sold', 'Transaction Spend', 'Transaction Revenue',
+    'Deposit', 'Withdraw', 'Send',
+    'Copy Portfolio (Spot) - Profit Sharing with Leader',  # 带单收益分佣（USDT为正数）
+    'Lead Portfolio (Spot) - Create',  # 创建带单（USDT为负数）
+    'Lead Portfolio (Spot) - Deposit', 'Lead Portfolio (Spot) - Withdraw',  # 带单资金转移
+]
+
+# 交易记录CSV各列的类型（UTC_Time按字符串读取，随后统一解析）
+RAW_DATA_DTYPES = {
+    'UTC_Time': 'string',
+    'Account': 'category',
+    'Operation': 'category',
+    'Coin': 'category',
+    'Change': 'float64',
+    'Remark': 'string'
+}
+
+# Parquet缓存的格式版本：缓存内容的解析或类型处理方式变化时递增，使旧缓存失效
+CACHE_VERSION = 1
+# 写入缓存元数据的版本键（格式版本+列类型的哈希），与当前代码不一致的缓存视为过期
+CACHE_METADATA_KEY = b'binance_transactions.cache_key'
+CACHE_KEY = hashlib.sha256(f"{CACHE_VERSION}:{sorted(RAW_DATA_DTYPES.items())}".encode('utf-8')).hexdigest().encode('ascii')
+
+
+def _accumulate_balances(op_valid, coin_code, acct_code, amount, num_coins):
+    """逐笔累计两个账户的资产余额
+
+    返回每笔交易后其所在账户的余额快照 (N, num_coins)（float32存储），
+    以及主账户和Spot Lead账户的最终余额（float64累加）
+    """
+    n = amount.shape[0]
+    main_balances = np.zeros(num_coins, dtype=np.float64)
+    spot_lead_balances = np.zeros(num_coins, dtype=np.float64)
+    snapshots = np.empty((n, num_coins), dtype=np.float32)
+    for i in range(n):
+        balances = spot_lead_balances if acct_code[i] == 1 else main_balances
+        code = coin_code[i]
+        if op_valid[i] and code >= 0:
+            balances[code] += amount[i]
+        # 写入快照行（float64累加值转为float32存储），代替逐笔复制余额字典
+        for j in range(num_coins):
+            snapshots[i, j] = balances[j]
+    return snapshots, main_balances, spot_lead_balances
+
+if NUMBA_AVAILABLE:
+    _accumulate_balances = njit(cache=True)(_accumulate_balances)
+
+
+def _value_by_code(codes, amounts, price_map):
+    """按资产编码查价格表，返回各资产的USDT价值及总价值"""
+    values = np.empty_like(amounts)
+    total = 0.0
+    for i in range(codes.shape[0]):
+        value = amounts[i] * price_map[codes[i]]
+        values[i] = value
+        total += value
+    return values, total
+
+if NUMBA_AVAILABLE:
+    _value_by_code = njit(cache=True)(_value_by_code)
+
+
+def _returns_kernel(pv):
+    """一次遍历投资组合价值，计算日收益率、最大回撤以及有效日收益率的均值、标准差和盈亏天数"""
+    n = pv.shape[0]
+    daily_return = np.empty(n, dtype=np.float64)
+    daily_return[0] = np.nan
+    peak = pv[0]
+    max_drawdown = np.nan
+    count = 0
+    mean = 0.0
+    m2 = 0.0
+    positive = 0
+    negative = 0
+    for i in range(n):
+        # 回撤相对于截至当日的最高价值
+        if pv[i] > peak:
+            peak = pv[i]
+        drawdown = (pv[i] - peak) / peak
+        if not np.isnan(drawdown) and (np.isnan(max_drawdown) or drawdown < max_drawdown):
+            max_drawdown = drawdown
+        if i == 0:
+            continue
+        
+        r = pv[i] / pv[i - 1] - 1
+        daily_return[i] = r
+        if np.isnan(r):
+            continue
+        # Welford算法累计均值和方差
+        count += 1
+        delta = r - mean
+        mean += delta / count
+        m2 += delta * (r - mean)
+        if r > 0:
+            positive += 1
+        elif r < 0:
+            negative += 1
+    std = np.sqrt(m2 / (count - 1)) if count > 1 else np.nan
+    return daily_return, max_drawdown, mean, std, positive, negative
+
+if NUMBA_AVAILABLE:
+    # 延迟编译（不指定签名），只读数组（如pandas写时复制返回的数组）也能匹配；cache=True时从磁盘缓存加载。
+    # 价值为0时按NumPy语义得到inf/NaN，而不是抛出ZeroDivisionError。
+    # 不启用fastmath：它假定没有NaN，会破坏内核中的NaN判断
+    _returns_kernel = njit(cache=True, error_model='numpy')(_returns_kernel)
+
+def _read_raw_csv(path: str, columns: List[str]) -> pd.DataFrame:
+    """读取交易记录CSV的指定列，可用时直接使用pyarrow的多线程CSV读取器"""
+    if not PYARROW_AVAILABLE:
+        return pd.read_csv(path, usecols=columns, dtype=RAW_DATA_DTYPES)
+    
+    # 分类列读为字典编码，转换为pandas时直接得到category类型
+    arrow_types = {
+        'string': pa.string(),
+        'category': pa.dictionary(pa.int32(), pa.string()),
+        'float64': pa.float64(),
+    }
+    table = pacsv.read_csv(
+        path,
+        # 字段内不含换行符，允许pyarrow并行切分数据块
+        parse_options=pacsv.ParseOptions(newlines_in_values=False),
+        convert_options=pacsv.ConvertOptions(
+            include_columns=columns,
+            column_types={col: arrow_types[RAW_DATA_DTYPES[col]] for col in columns},
+            strings_can_be_null=True,
+        ),
+    )
+    return table.to_pandas()
+
+def _write_csv(df: pd.DataFrame, path: str):
+    """写出CSV文件（索引作为第一列，浮点数保留8位小数）；只含数值列且可用时使用pyarrow的C++写出器，输出与to_csv一致"""
+    numeric_only = all(
+        pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype) for dtype in df.dtypes
+    )
+    if not PYARROW_AVAILABLE or not numeric_only:
+        df.to_csv(path, float_format='%.8f', chunksize=10_000)
+        return
+    
+    # pyarrow写出器不支持格式化字符串：浮点列先按'%.8f'格式化（NaN写为空字段），索引按to_csv相同的方式转为字符串；
+    # 日期和数值字段都不含分隔符或引号，因此字段不加引号。pyarrow总会给表头加引号，表头由这里按to_csv的格式写出
+    header = [df.index.name or ''] + [str(col) for col in df.columns]
+    arrays = [pa.array(np.asarray(df.index.astype(str), dtype=str))]
+    for col in df.columns:
+        values = df[col].to_numpy()
+        if np.issubdtype(values.dtype, np.floating):
+            arrays.append(pa.array(np.char.mod('%.8f', values), mask=np.isnan(values)))
+        else:
+            arrays.append(pa.array(values))
+    table = pa.Table.from_arrays(arrays, names=header)
+    with open(path, 'wb') as f:
+        f.write((','.join(header) + '\n').encode('utf-8'))
+        pacsv.write_csv(table, f, write_options=pacsv.WriteOptions(include_header=False, quoting_style='none'))
+
+def _is_cache_fresh(source_path: str, cache_path: str) -> bool:
+    """Parquet缓存存在、不早于源文件且版本键与当前代码一致时可直接使用"""
+    if not (
+        PYARROW_AVAILABLE
+        and os.path.exists(cache_path)
+        and os.path.getmtime(cache_path) >= os.path.getmtime(source_path)
+    ):
+        return False
+    try:
+        # 只读取文件尾部的schema，不读取数据
+        metadata = pq.read_schema(cache_path).metadata or {}
+    except Exception as e:
+        logger.warning(f"读取缓存 {cache_path} 的元数据失败: {e}")
+        return False
+    if metadata.get(CACHE_METADATA_KEY) != CACHE_KEY:
+        logger.info(f"缓存 {cache_path} 的版本与当前代码不一致，重新解析源文件")
+        return False
+    return True
+
+def _save_cache(df: pd.DataFrame, cache_path: str):
+    """将解析后的数据保存为Parquet缓存（保留列类型，包括分类类型）"""
+    if not PYARROW_AVAILABLE:
+        return
+    try:
+        table = pa.Table.from_pandas(df)
+        # 保留pandas元数据（恢复索引和分类类型），并写入版本键
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), CACHE_METADATA_KEY: CACHE_KEY})
+        pq.write_table(table, cache_path, compression='zstd')
+    except Exception as e:
+        logger.warning(f"保存缓存 {cache_path} 失败: {e}")
+
+def _save_output(df: pd.DataFrame, stem: str, index: bool = True) -> List[str]:
+    """保存较大的输出表：总是写出CSV，可用时同时写出同名Parquet文件（列式二进制，保留类型），返回写出的文件名列表"""
+    csv_path = f'{stem}.csv'
+    df.to_csv(csv_path, index=index, chunksize=100_000, float_format='%.8f')
+    paths = [csv_path]
+    if PYARROW_AVAILABLE:
+        parquet_path = f'{stem}.parquet'
+        try:
+            df.to_parquet(parquet_path, engine='pyarrow', index=index, compression='snappy')
+            paths.append(parquet_path)
+        except Exception as e:
+            logger.warning(f"保存Parquet文件 {parquet_path} 失败: {e}")
+    return paths
 
 class BinanceTransactionAnalyzer:
     def __init__(self, csv_file_path: str, btc_price_file_path: str = 'btc_prices.csv'):
@@ -41,33 +298,57 @@ class BinanceTransactionAnalyzer:
         self.daily_portfolio_value = None
         self.btc_price_data = None
         self.spot_lead_balances = {}  # 新增：单独跟踪Spot Lead账户的余额
+        self._btc_price_series = None  # 按分析日期范围对齐的BTC价格
+        self._utc_date = None  # 交易日期（按天取整）
+        self._btc_price_cache = {}  # 日期 -> BTC价格
+        self._btc_close_by_day = None  # 按天连续存放的BTC收盘价（缺失日期为NaN）
+        self._btc_first_day = 0  # _btc_close_by_day首个元素对应的天数（自1970-01-01起）
         
     def load_data(self):
         """加载CSV数据"""
         try:
-            self.raw_data = pd.read_csv(self.csv_file)
-            logger.info(f"成功加载 {len(self.raw_data)} 条交易记录")
+            # 优先使用上次解析后保存的Parquet缓存
+            cache_file = self.csv_file + '.parquet'
+            if _is_cache_fresh(self.csv_file, cache_file):
+                self.raw_data = pd.read_parquet(cache_file, engine='pyarrow')
+                logger.info(f"从缓存 {cache_file} 加载 {len(self.raw_data)} 条有效交易记录")
+                return True
             
-            # 检查必要的列是否存在
+            # 检查必要的列是否存在（只读取表头）
             required_columns = ['UTC_Time', 'Account', 'Operation', 'Coin', 'Change', 'Remark']
-            missing_columns = [col for col in required_columns if col not in self.raw_data.columns]
+            header = pd.read_csv(self.csv_file, nrows=0).columns
+            missing_columns = [col for col in required_columns if col not in header]
             if missing_columns:
                 raise ValueError(f"缺少必要的列: {missing_columns}")
             
-            logger.info(f"交易记录时间范围: {self.raw_data.iloc[0]['UTC_Time']} 到 {self.raw_data.iloc[-1]['UTC_Time']}")
+            # 只读取需要的列，并显式指定列类型，避免逐列类型推断
+            self.raw_data = _read_raw_csv(self.csv_file, required_columns)
+            logger.info(f"成功加载 {len(self.raw_data)} 条交易记录")
+            
+            utc_time = self.raw_data['UTC_Time']
+            logger.info(f"交易记录时间范围: {utc_time.iat[0]} 到 {utc_time.iat[-1]}")
             
             # 转换时间戳为datetime对象，确保timezone一致性
-            self.raw_data['UTC_Time'] = pd.to_datetime(self.raw_data['UTC_Time'], errors='coerce')
+            self.raw_data['UTC_Time'] = pd.to_datetime(
+                self.raw_data['UTC_Time'], format='ISO8601', errors='coerce', cache=True
+            )
             
             # 过滤掉无效的时间戳
             valid_time_mask = self.raw_data['UTC_Time'].notna()
             if not valid_time_mask.all():
                 logger.warning(f"过滤掉 {len(valid_time_mask) - valid_time_mask.sum()} 条无效时间戳的记录")
             
-            self.raw_data = self.raw_data[valid_time_mask]
+            self.raw_data = self.raw_data[valid_time_mask].copy()
             self.raw_data['UTC_Time'] = self.raw_data['UTC_Time'].dt.tz_localize(None)
             
+            # 重复取值的字符串列使用分类类型，后续比较、isin和分组都基于整数编码
+            for col in ('Account', 'Operation', 'Coin'):
+                self.raw_data[col] = self.raw_data[col].astype('category').cat.remove_unused_categories()
+            
             logger.info(f"有效记录数量: {len(self.raw_data)}")
+            logger.debug(f"交易数据内存占用: {self.raw_data.memory_usage(deep=True).sum() / 1024 ** 2:.2f} MB")
+            
+            _save_cache(self.raw_data, cache_file)
             return True
             
         except FileNotFoundError:
@@ -84,6 +365,15 @@ class BinanceTransactionAnalyzer:
         """从本地CSV文件加载比特币价格数据"""
         try:
             logger.info("从本地文件加载比特币价格数据...")
+            self._btc_price_cache.clear()
+            
+            # 优先使用上次解析后保存的Parquet缓存
+            cache_file = self.btc_price_file + '.parquet'
+            if _is_cache_fresh(self.btc_price_file, cache_file):
+                self.btc_price_data = pd.read_parquet(cache_file, engine='pyarrow')
+                logger.info(f"从缓存 {cache_file} 加载 {len(self.btc_price_data)} 条BTC价格记录")
+                self._build_btc_close_table()
+                return True
             
             self.btc_price_data = pd.read_csv(self.btc_price_file)
             
@@ -92,7 +382,10 @@ class BinanceTransactionAnalyzer:
                 raise ValueError("BTC价格文件必须包含 'date' 和 'close_price' 列")
             
             # 转换日期格式
-            self.btc_price_data['date'] = pd.to_datetime(self.btc_price_data['date'], errors='coerce')
+            # 价格文件的日期格式不固定，忽略pandas逐个解析日期时的格式推断警告
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore')
+                self.btc_price_data['date'] = pd.to_datetime(self.btc_price_data['date'], errors='coerce')
             
             # 过滤无效数据
             valid_mask = self.btc_price_data['date'].notna() & self.btc_price_data['close_price'].notna()
@@ -100,12 +393,20 @@ class BinanceTransactionAnalyzer:
             
             self.btc_price_data.set_index('date', inplace=True)
             
+            # 价格索引统一到日期粒度（同一天保留最后一条），并按日期排序，便于批量按最近日期对齐
+            self.btc_price_data.index = self.btc_price_data.index.normalize()
+            self.btc_price_data = self.btc_price_data[~self.btc_price_data.index.duplicated(keep='last')].sort_index()
+            
             # 只保留需要的列
             self.btc_price_data = self.btc_price_data[['close_price']].rename(columns={'close_price': 'close'})
+            # 日线收盘价只需保留到分，float32的精度足够，内存减半
+            self.btc_price_data['close'] = pd.to_numeric(self.btc_price_data['close'], downcast='float')
             
             logger.info(f"成功加载 {len(self.btc_price_data)} 条BTC价格记录")
             logger.info(f"BTC价格范围: {self.btc_price_data['close'].min():.2f} - {self.btc_price_data['close'].max():.2f} USDT")
             
+            _save_cache(self.btc_price_data, cache_file)
+            self._build_btc_close_table()
             return True
             
         except FileNotFoundError:
@@ -115,6 +416,17 @@ class BinanceTransactionAnalyzer:
             logger.error(f"加载BTC价格数据失败: {e}")
             return False
     
+    def _build_btc_close_table(self):
+        """将BTC收盘价展开为按天连续的数组，按日期查价只需一次整数下标访问"""
+        if self.btc_price_data is None or self.btc_price_data.empty:
+            self._btc_close_by_day = None
+            return
+        
+        days = self.btc_price_data.index.to_numpy().astype('datetime64[D]').astype(np.int64)
+        self._btc_first_day = days.min()
+        self._btc_close_by_day = np.full(days.max() - self._btc_first_day + 1, np.nan, dtype=np.float32)
+        self._btc_close_by_day[days - self._btc_first_day] = self.btc_price_data['close'].to_numpy()
+    
     def analyze_transactions(self):
         """分析交易数据"""
         if self.raw_data is None:
@@ -128,8 +440,13 @@ class BinanceTransactionAnalyzer:
             logger.warning("无法加载BTC价格数据，将使用估算价格")
             self.btc_price_data = None
         
-        # 按时间排序
-        self.raw_data = self.raw_data.sort_values('UTC_Time')
+        # 按时间排序（稳定排序，同一时刻的记录保持文件中的顺序），已有序时跳过
+        if not self.raw_data['UTC_Time'].is_monotonic_increasing:
+            self.raw_data.sort_values('UTC_Time', inplace=True, kind='mergesort')
+        self.raw_data.reset_index(drop=True, inplace=True)
+        
+        # 缓存交易日期（datetime64，按天取整），供后续按日期筛选和分组复用
+        self._utc_date = self.raw_data['UTC_Time'].dt.floor('D')
         
         # 计算各资产的数量变化
         self._calculate_asset_balances()
@@ -143,19 +460,31 @@ class BinanceTransactionAnalyzer:
         return True
     
     def _get_btc_price_for_date(self, date) -> float:
-        """获取指定日期的BTC价格"""
+        """获取指定日期的BTC价格（按日期缓存查询结果）"""
+        price = self._btc_price_cache.get(date)
+        if price is None:
+            price = self._lookup_btc_price(date)
+            self._btc_price_cache[date] = price
+        return price
+    
+    def _lookup_btc_price(self, date) -> float:
+        """查询指定日期的BTC价格"""
         if self.btc_price_data is None or self.btc_price_data.empty:
             # 如果没有价格数据，使用基于时间的估算
-            logger.warning(f"使用估算BTC价格 for {date}")
-            # 简单的价格估算逻辑（基于大概的历史价格趋势）
-            base_date = datetime(2021, 1, 1)
-            days_diff = (date - base_date).days
-            # 使用一个简单的指数增长模型作为估算
-            return 30000 * (1.001 ** days_diff)  # 这个公式可以根据实际情况调整
+            # 每个日期都会调用，只在DEBUG级别记录（缺少价格数据的警告在加载时已输出）
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("使用估算BTC价格 for %s", date)
+            return float(self._estimate_btc_prices([date])[0])
+        
+        # 优先使用预先对齐到分析日期范围的价格序列
+        if self._btc_price_series is not None and date in self._btc_price_series.index:
+            return float(self._btc_price_series.at[date])
         
         # 尝试获取精确日期的价格
-        if date in self.btc_price_data.index:
-            return float(self.btc_price_data.loc[date, 'close'])
+        if self._btc_close_by_day is not None:
+            offset = np.datetime64(pd.Timestamp(date), 'D').astype(np.int64) - self._btc_first_day
+            if 0 <= offset < self._btc_close_by_day.size and not np.isnan(self._btc_close_by_day[offset]):
+                return float(self._btc_close_by_day[offset])
         
         # 如果没有精确日期，使用最近的价格
         try:
@@ -167,83 +496,77 @@ class BinanceTransactionAnalyzer:
             logger.warning(f"获取BTC价格失败 for {date}: {e}")
             return 95000.0  # 默认价格
     
+    def _estimate_btc_prices(self, dates) -> np.ndarray:
+        """没有价格数据时批量估算BTC价格"""
+        # 简单的价格估算逻辑（基于大概的历史价格趋势）
+        base_date = pd.Timestamp(2021, 1, 1)
+        days_diff = (pd.DatetimeIndex(dates).normalize() - base_date).days.to_numpy()
+        # 使用一个简单的指数增长模型作为估算
+        return 30000 * (1.001 ** days_diff)  # 这个公式可以根据实际情况调整
+    
     def _calculate_asset_balances(self):
         """计算各资产的数量变化"""
         logger.info("计算资产数量变化...")
         
-        # 初始化资产余额（分开主账户和Spot Lead账户）
-        self.asset_balances = {
-            'USDT': 0.0,
-            'BTC': 0.0,
-            'BNB': 0.0,
-            'ETH': 0.0,
-            'SOL': 0.0,
-            'BUSD': 0.0,
-            'USD': 0.0
-        }
-        
-        self.spot_lead_balances = {
-            'USDT': 0.0,
-            'BTC': 0.0,
-            'BNB': 0.0,
-            'ETH': 0.0,
-            'SOL': 0.0,
-            'BUSD': 0.0,
-            'USD': 0.0
-        }
+        df = self.raw_data
+        
+        # 一次性提取列数组，避免逐行迭代
+        timestamps = df['UTC_Time'].to_numpy()
+        account = df['Account'].to_numpy()
+        operation = df['Operation'].to_numpy()
+        coin = df['Coin'].to_numpy()
+        amount = df['Change'].to_numpy(dtype=np.float64)
+        remark = df['Remark'].to_numpy()
+        
+        # 只有有效操作才计入余额（买卖、充提、带单收益分佣及带单资金转移）
+        op_in_valid_set = df['Operation'].isin(VALID_OPERATIONS).to_numpy()
+        is_spot_lead = (df['Account'] == 'Spot Lead').to_numpy()
+        
+        # 币种编码为资产下标（未跟踪的币种为-1）
+        coin_code = df['Coin'].astype('category').cat.set_categories(ASSET_LIST).cat.codes.to_numpy(dtype=np.int64)
+        
+        # 余额快照以float32存储（历史矩阵是最大的中间数据），累加过程保持float64避免误差累积
+        if NUMBA_AVAILABLE:
+            # 账户编码为 0=主账户、1=Spot Lead
+            snapshots, main_final, spot_lead_final = _accumulate_balances(
+                op_in_valid_set, coin_code, is_spot_lead.astype(np.int64), amount, len(ASSET_LIST)
+            )
+        else:
+            snapshots, main_final, spot_lead_final = None, None, None
         
-        # 记录资产变化历史
-        balance_history = []
-        spot_lead_history = []
-        
-        # 遍历每笔交易
-        for idx, row in self.raw_data.iterrows():
-            account = row['Account']
-            operation = row['Operation']
-            coin = row['Coin']
-            amount = float(row['Change'])
-            remark = row['Remark']
+        def build_history(acct_mask, final):
+            """按账户计算各资产的累计余额，返回余额历史和最终余额"""
+            sub_amount = amount[acct_mask]
             
-            # 确定操作哪个账户的余额
-            if account == 'Spot Lead':
-                target_balances = self.spot_lead_balances
-                target_history = spot_lead_history
+            if snapshots is not None:
+                running = snapshots[acct_mask]
             else:
-                target_balances = self.asset_balances
-                target_history = balance_history
+                sub_code = coin_code[acct_mask]
+                sub_valid = op_in_valid_set[acct_mask]
+                # 每笔有效交易的金额散布到其资产列，再沿时间方向一次性累加
+                contributions = np.zeros((len(sub_amount), len(ASSET_LIST)), dtype=np.float64)
+                rows = np.flatnonzero(sub_valid & (sub_code >= 0))
+                contributions[rows, sub_code[rows]] = sub_amount[rows]
+                running64 = contributions.cumsum(axis=0)
+                final = running64[-1] if len(running64) else np.zeros(len(ASSET_LIST))
+                running = running64.astype(np.float32)
             
-            # 处理不同类型的交易
-            if operation in ['Transaction Buy', 'Transaction Sold', 'Transaction Spend', 'Transaction Revenue']:
-                if coin in target_balances:
-                    target_balances[coin] += amount
-            elif operation in ['Deposit', 'Withdraw', 'Send']:
-                if coin in target_balances:
-                    target_balances[coin] += amount
-            elif operation in ['Copy Portfolio (Spot) - Profit Sharing with Leader']:
-                # 带单收益分佣（USDT为正数）
-                if coin in target_balances:
-                    target_balances[coin] += amount
-            elif operation in ['Lead Portfolio (Spot) - Create']:
-                # 创建带单（USDT为负数）
-                if coin in target_balances:
-                    target_balances[coin] += amount
-            elif operation in ['Lead Portfolio (Spot) - Deposit', 'Lead Portfolio (Spot) - Withdraw']:
-                # 带单资金转移
-                if coin in target_balances:
-                    target_balances[coin] += amount
+            final_balances = {asset: float(final[j]) for j, asset in enumerate(ASSET_LIST)}
             
-            # 记录余额变化
-            balance_copy = target_balances.copy()
-            balance_copy['timestamp'] = row['UTC_Time']
-            balance_copy['operation'] = operation
-            balance_copy['coin'] = coin
-            balance_copy['amount'] = amount
-            balance_copy['remark'] = remark
-            balance_copy['account'] = account
-            target_history.append(balance_copy)
-        
-        self.balance_history = pd.DataFrame(balance_history)
-        self.spot_lead_history = pd.DataFrame(spot_lead_history)
+            # 余额矩阵直接作为一个数值块构建DataFrame，元数据列按列数组附加
+            history = pd.DataFrame(running, columns=ASSET_LIST).assign(
+                timestamp=timestamps[acct_mask],
+                operation=operation[acct_mask],
+                coin=coin[acct_mask],
+                amount=sub_amount,
+                remark=remark[acct_mask],
+                account=account[acct_mask]
+            )
+            return history, final_balances
+        
+        # 分开主账户和Spot Lead账户
+        self.balance_history, self.asset_balances = build_history(~is_spot_lead, main_final)
+        self.spot_lead_history, self.spot_lead_balances = build_history(is_spot_lead, spot_lead_final)
         logger.info("资产数量变化计算完成")
         
         # 打印最终余额
@@ -266,91 +589,85 @@ class BinanceTransactionAnalyzer:
             return
         
         # 创建日期范围
-        all_timestamps = pd.concat([
-            self.balance_history['timestamp'] if not self.balance_history.empty else pd.Series(),
-            self.spot_lead_history['timestamp'] if not self.spot_lead_history.empty else pd.Series()
-        ])
+        timestamps = [
+            history['timestamp'] for history in (self.balance_history, self.spot_lead_history)
+            if not history.empty
+        ]
         
-        if all_timestamps.empty:
+        if not timestamps:
             logger.error("没有有效的时间戳数据")
             return
         
-        start_date = all_timestamps.min().date()
-        end_date = all_timestamps.max().date()
+        # 分别取两个账户的最早/最晚时间，无需合并成一个新的Series
+        start_date = min(ts.min() for ts in timestamps).date()
+        end_date = max(ts.max() for ts in timestamps).date()
         
         date_range = pd.date_range(start=start_date, end=end_date, freq='D')
         
-        # 初始化每日价值
-        daily_values = []
-        
-        # 合并主账户和Spot Lead账户的余额
-        def get_balances_at_time(timestamp):
-            """获取指定时间的资产余额"""
-            # 获取主账户余额
-            main_balance = {}
-            if not self.balance_history.empty:
-                main_history_up_to_time = self.balance_history[self.balance_history['timestamp'] <= timestamp]
-                if not main_history_up_to_time.empty:
-                    main_balance = main_history_up_to_time.iloc[-1].to_dict()
-                    # 提取资产余额
-                    main_balance = {k: v for k, v in main_balance.items() if k in ['USDT', 'BTC', 'BNB', 'ETH', 'SOL', 'BUSD', 'USD']}
-            
-            # 获取Spot Lead账户余额
-            spot_lead_balance = {}
-            if not self.spot_lead_history.empty:
-                spot_history_up_to_time = self.spot_lead_history[self.spot_lead_history['timestamp'] <= timestamp]
-                if not spot_history_up_to_time.empty:
-                    spot_balance = spot_history_up_to_time.iloc[-1].to_dict()
-                    spot_lead_balance = {k: v for k, v in spot_balance.items() if k in ['USDT', 'BTC', 'BNB', 'ETH', 'SOL', 'BUSD', 'USD']}
-            
-            # 合并余额（只包含非负值）
-            combined_balance = {}
-            all_assets = set(list(main_balance.keys()) + list(spot_lead_balance.keys()))
-            
-            for asset in all_assets:
-                main_val = main_balance.get(asset, 0.0)
-                spot_val = spot_lead_balance.get(asset, 0.0)
-                # 确保余额不为负
-                combined_balance[asset] = max(0.0, main_val) + max(0.0, spot_val)
-            
-            return combined_balance
-        
-        # 遍历每个日期
-        for date in date_range:
-            end_of_day = pd.Timestamp(date) + pd.Timedelta(hours=23, minutes=59, seconds=59)
-            
-            # 获取当日结束时的余额
-            balances = get_balances_at_time(end_of_day)
-            
-            if balances:
-                portfolio_value = 0.0
-                
-                # 计算总价值
-                for asset, balance in balances.items():
-                    if asset == 'USDT' or asset == 'USD':
-                        portfolio_value += balance
-                    elif asset == 'BTC':
-                        # 使用从文件获取的BTC价格
-                        btc_price = self._get_btc_price_for_date(date)
-                        portfolio_value += balance * btc_price
-                    else:
-                        # 其他资产使用估算价格
-                        price = self._get_price_estimate(asset, date)
-                        portfolio_value += balance * price
-                
-                daily_values.append({
-                    'date': date,
-                    'portfolio_value': portfolio_value,
-                    'USDT_balance': balances.get('USDT', 0.0),
-                    'BTC_balance': balances.get('BTC', 0.0),
-                    'BTC_price': self._get_btc_price_for_date(date),
-                    'ETH_balance': balances.get('ETH', 0.0),
-                    'BNB_balance': balances.get('BNB', 0.0),
-                    'SOL_balance': balances.get('SOL', 0.0),
-                    'other_balance': sum(v for k, v in balances.items() if k not in ['USDT', 'BTC', 'ETH', 'BNB', 'SOL', 'USD'])
-                })
-        
-        self.daily_portfolio_value = pd.DataFrame(daily_values)
+        # 一次性将BTC价格对齐到日期范围（取最近日期的价格）
+        if self.btc_price_data is not None and not self.btc_price_data.empty:
+            self._btc_price_series = self.btc_price_data['close'].reindex(date_range, method='nearest')
+        else:
+            self._btc_price_series = None
+        self._btc_price_cache.clear()
+        
+        # 每日结束时刻（23:59:59）
+        end_of_days = pd.DataFrame({'ts': date_range + pd.Timedelta(hours=23, minutes=59, seconds=59)})
+        
+        def get_balances_at_end_of_day(history):
+            """通过merge_asof一次性获取每日结束时的资产余额（当时还没有记录的日期为NaN）"""
+            if history.empty:
+                return pd.DataFrame(np.nan, index=end_of_days.index, columns=ASSET_LIST)
+            merged = pd.merge_asof(
+                end_of_days,
+                history[['timestamp'] + ASSET_LIST],
+                left_on='ts',
+                right_on='timestamp',
+                direction='backward'
+            )
+            return merged[ASSET_LIST]
+        
+        main_balances = get_balances_at_end_of_day(self.balance_history)
+        spot_lead_balances = get_balances_at_end_of_day(self.spot_lead_history)
+        
+        # 两个账户在当日结束时都还没有记录的日期没有余额
+        has_balances = (main_balances.notna().any(axis=1) | spot_lead_balances.notna().any(axis=1)).to_numpy()
+        
+        # 合并余额（确保余额不为负）
+        combined_balances = (
+            np.maximum(main_balances.fillna(0.0), 0.0) +
+            np.maximum(spot_lead_balances.fillna(0.0), 0.0)
+        )
+        
+        daily_balances = combined_balances[has_balances]
+        dates = date_range[has_balances]
+        
+        # 价格矩阵：BTC使用从文件获取的每日价格，其他资产使用估算价格
+        if self._btc_price_series is None:
+            btc_prices = self._estimate_btc_prices(dates)
+        else:
+            btc_prices = self._btc_price_series.to_numpy(dtype=np.float64)[has_balances]
+        
+        prices = np.tile(PRICE_VEC, (len(dates), 1))
+        prices[:, ASSET_CODES['BTC']] = btc_prices
+        
+        # 计算总价值（余额矩阵只转换一次，逐行点积不产生中间乘积矩阵）
+        balances = daily_balances.to_numpy(dtype=np.float64)
+        portfolio_values = np.einsum('ti,ti->t', balances, prices)
+        
+        other_codes = [ASSET_CODES[asset] for asset in ASSET_LIST if asset not in ['USDT', 'BTC', 'ETH', 'BNB', 'SOL', 'USD']]
+        # 余额快照和BTC收盘价本身就是float32精度，这些列按float32保存；总价值保留float64
+        self.daily_portfolio_value = pd.DataFrame({
+            'date': dates,
+            'portfolio_value': portfolio_values,
+            'USDT_balance': balances[:, ASSET_CODES['USDT']].astype(np.float32),
+            'BTC_balance': balances[:, ASSET_CODES['BTC']].astype(np.float32),
+            'BTC_price': btc_prices.astype(np.float32),
+            'ETH_balance': balances[:, ASSET_CODES['ETH']].astype(np.float32),
+            'BNB_balance': balances[:, ASSET_CODES['BNB']].astype(np.float32),
+            'SOL_balance': balances[:, ASSET_CODES['SOL']].astype(np.float32),
+            'other_balance': balances[:, other_codes].sum(axis=1).astype(np.float32)
+        })
         logger.info(f"计算了 {len(self.daily_portfolio_value)} 天的投资组合价值")
         
         # 打印价格信息
@@ -362,27 +679,7 @@ class BinanceTransactionAnalyzer:
     
     def _get_price_estimate(self, coin: str, date) -> float:
         """获取资产价格估算（用于非BTC资产）"""
-        # 更详细的价格估算表
-        price_estimates = {
-            'USDT': 1.0,
-            'BUSD': 1.0,
-            'USD': 1.0,
-            'ETH': 3000.0,
-            'BNB': 300.0,
-            'SOL': 100.0,
-            'ADA': 0.5,
-            'DOT': 10.0,
-            'LINK': 15.0,
-            'AVAX': 30.0,
-            'UNI': 6.0,
-            'ATOM': 10.0,
-            'MATIC': 0.5,
-            'XRP': 0.5,
-            'LTC': 70.0,
-            'BCH': 250.0,
-            'DOGE': 0.08
-        }
-        return price_estimates.get(coin, 1.0)
+        return PRICE_ESTIMATES.get(coin, 1.0)
     
     def _calculate_returns(self):
         """计算收益率"""
@@ -392,26 +689,46 @@ class BinanceTransactionAnalyzer:
         
         logger.info("计算收益率...")
         
-        # 计算日收益率
-        self.daily_portfolio_value['daily_return'] = self.daily_portfolio_value['portfolio_value'].pct_change()
+        pv = self.daily_portfolio_value['portfolio_value'].to_numpy(dtype=np.float64)
+        
+        if NUMBA_AVAILABLE:
+            # 日收益率、回撤和统计量在一次遍历中完成
+            daily_return, max_drawdown, mean_return, volatility, positive_days, negative_days = _returns_kernel(pv)
+        else:
+            # 计算日收益率（第一天为NaN）
+            daily_return = np.empty_like(pv)
+            daily_return[0] = np.nan
+            with np.errstate(divide='ignore', invalid='ignore'):
+                daily_return[1:] = pv[1:] / pv[:-1] - 1
+            valid_returns = daily_return[~np.isnan(daily_return)]
+            mean_return = valid_returns.mean() if valid_returns.size else 0.0
+            volatility = valid_returns.std(ddof=1) if valid_returns.size > 1 else np.nan
+            positive_days = (valid_returns > 0).sum()
+            negative_days = (valid_returns < 0).sum()
+            
+            # 计算最大回撤
+            peak = np.maximum.accumulate(pv)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                drawdown = (pv - peak) / peak
+            max_drawdown = np.nanmin(drawdown) if not np.isnan(drawdown).all() else np.nan
+        
+        self.daily_portfolio_value['daily_return'] = daily_return
         
         # 计算累计收益率
-        initial_value = self.daily_portfolio_value['portfolio_value'].iloc[0]
+        initial_value = pv[0]
         if initial_value > 0:
-            self.daily_portfolio_value['cumulative_return'] = (
-                self.daily_portfolio_value['portfolio_value'] - initial_value
-            ) / initial_value
+            self.daily_portfolio_value['cumulative_return'] = (pv - initial_value) / initial_value
         
         # 计算统计指标
         self.return_stats = {
-            'total_return': (self.daily_portfolio_value['portfolio_value'].iloc[-1] - initial_value) / initial_value if initial_value > 0 else 0,
+            'total_return': (pv[-1] - initial_value) / initial_value if initial_value > 0 else 0,
             'annualized_return': None,
-            'volatility': self.daily_portfolio_value['daily_return'].std(),
-            'max_drawdown': None,
+            'volatility': float(volatility),
+            'max_drawdown': float(max_drawdown),
             'sharpe_ratio': None,
-            'total_days': len(self.daily_portfolio_value),
-            'positive_days': len(self.daily_portfolio_value[self.daily_portfolio_value['daily_return'] > 0]),
-            'negative_days': len(self.daily_portfolio_value[self.daily_portfolio_value['daily_return'] < 0])
+            'total_days': len(pv),
+            'positive_days': int(positive_days),
+            'negative_days': int(negative_days)
         }
         
         # 计算年化收益率
@@ -421,18 +738,13 @@ class BinanceTransactionAnalyzer:
             if years > 0:
                 self.return_stats['annualized_return'] = (1 + self.return_stats['total_return']) ** (1 / years) - 1
         
-        # 计算最大回撤
-        peak = self.daily_portfolio_value['portfolio_value'].expanding().max()
-        drawdown = (self.daily_portfolio_value['portfolio_value'] - peak) / peak
-        self.return_stats['max_drawdown'] = drawdown.min()
-        
         # 计算夏普比率（假设无风险利率为2%）
         risk_free_rate = 0.02  # 2%年化无风险利率
         daily_risk_free = (1 + risk_free_rate) ** (1 / 365.25) - 1
-        excess_returns = self.daily_portfolio_value['daily_return'] - daily_risk_free
         
         if self.return_stats['volatility'] > 0:
-            self.return_stats['sharpe_ratio'] = excess_returns.mean() / self.return_stats['volatility'] * np.sqrt(365.25)
+            excess_return = mean_return - daily_risk_free
+            self.return_stats['sharpe_ratio'] = excess_return / self.return_stats['volatility'] * np.sqrt(365.25)
         
         logger.info("收益率计算完成")
     
@@ -440,69 +752,58 @@ class BinanceTransactionAnalyzer:
         """生成transactions数据（pyfolio格式）"""
         logger.info("生成transactions数据...")
         
-        transactions = []
-        
-        # 根据README：只记录交易比特币的数据
-        # 需要匹配的BTC交易操作和对应的USDT交易操作
-        valid_operations = ['Transaction Buy', 'Transaction Sold', 'Transaction Spend', 'Transaction Revenue']
-        
-        # 从原始交易数据中提取BTC交易
-        for _, row in self.raw_data.iterrows():
-            date = row['UTC_Time'].date()
-            operation = row['Operation']
-            coin = row['Coin']
-            amount = float(row['Change'])
-            account = row['Account']
-            
-            # 跳过Spot Lead账户和无效的操作/币种
-            if account == 'Spot Lead' or operation not in valid_operations:
-                continue
-            
-            try:
-                # 根据README的最新解释：
-                # 只记录交易比特币的数据
-                # txn_volume: 交易比特币的USDT金额，买入时为正，txn_volume = - Transaction Spend USDT change，卖出时为负，txn_volume = - Transaction Revenue USDT change
-                # txn_shares: 交易比特币的数量，买入时为正，txn_shares = Transaction Buy BTC change，卖出时为负，txn_shares = Transaction Sold BTC change
-                
-                if coin == 'BTC':
-                    # 处理BTC交易记录
-                    if operation == 'Transaction Buy':
-                        # 买入BTC：amount是正数，表示买入的BTC数量
-                        txn_shares = amount  # 买入BTC数量（正数）
-                        # 需要找到对应的Transaction Spend USDT记录来计算txn_volume
-                        txn_volume = self._find_matching_usdt_spend(date, amount)
-                    elif operation == 'Transaction Sold':
-                        # 卖出BTC：amount是正数，表示卖出的BTC数量
-                        txn_shares = -amount  # 卖出BTC数量（负数）
-                        # 需要找到对应的Transaction Revenue USDT记录来计算txn_volume
-                        txn_volume = self._find_matching_usdt_revenue(date, amount)
-                    else:
-                        # BTC不应该有Spend/Revenue操作，跳过
-                        continue
-                        
-                    # 只记录有效交易（排除零值）
-                    if abs(txn_shares) > 1e-10 and abs(txn_volume) > 1e-10:
-                        transactions.append({
-                            'date': date,
-                            'txn_shares': txn_shares,
-                            'txn_volume': txn_volume
-                        })
-                        
-                # USDT记录用于匹配BTC交易，不直接记录到transactions中
-                # 但我们需要收集这些信息用于匹配
-                
-            except Exception as e:
-                logger.warning(f"处理交易失败 {date} {operation} {coin} {amount}: {e}")
-                continue
+        # 根据README的最新解释：只记录交易比特币的数据
+        # txn_volume: 交易比特币的USDT金额，买入时为正，txn_volume = - Transaction Spend USDT change，卖出时为负，txn_volume = - Transaction Revenue USDT change
+        # txn_shares: 交易比特币的数量，买入时为正，txn_shares = Transaction Buy BTC change，卖出时为负，txn_shares = Transaction Sold BTC change
+        df = self.raw_data
+        utc_date = self._utc_date
+        main_account = df['Account'] != 'Spot Lead'
+        
+        # 预先按日期建立主账户USDT Spend/Revenue记录的查找表（每天取第一条记录）
+        usdt_mask = main_account & (df['Coin'] == 'USDT')
+        spend_by_date = self._first_change_by_date(usdt_mask & (df['Operation'] == 'Transaction Spend'), utc_date)
+        revenue_by_date = self._first_change_by_date(usdt_mask & (df['Operation'] == 'Transaction Revenue'), utc_date)
+        
+        # 主账户的BTC买入/卖出记录（BTC不应该有Spend/Revenue操作）
+        btc_mask = main_account & (df['Coin'] == 'BTC')
+        buy_mask = btc_mask & (df['Operation'] == 'Transaction Buy')
+        trade_mask = buy_mask | (btc_mask & (df['Operation'] == 'Transaction Sold'))
+        
+        dates = pd.DatetimeIndex(utc_date[trade_mask])
+        amount = df.loc[trade_mask, 'Change'].to_numpy(dtype=np.float64)
+        is_buy = buy_mask[trade_mask].to_numpy()
+        
+        # 买入BTC数量为正，卖出BTC数量为负（Change均为正数）
+        txn_shares = np.where(is_buy, amount, -amount)
+        
+        # 买入匹配当天的Transaction Spend记录，卖出匹配当天的Transaction Revenue记录
+        usdt_amount = np.where(
+            is_buy,
+            spend_by_date.reindex(dates).to_numpy(dtype=np.float64),
+            revenue_by_date.reindex(dates).to_numpy(dtype=np.float64)
+        )
+        txn_volume = -usdt_amount
+        
+        # 没有匹配的USDT记录时，使用BTC价格估算
+        unmatched = np.isnan(usdt_amount)
+        if unmatched.any():
+            txn_volume[unmatched] = txn_shares[unmatched] * self._btc_prices_for(dates[unmatched])
+        
+        # 只记录有效交易（排除零值）
+        valid = (np.abs(txn_shares) > 1e-10) & (np.abs(txn_volume) > 1e-10)
+        transactions_df = pd.DataFrame({
+            'date': dates[valid],
+            'txn_shares': txn_shares[valid],
+            'txn_volume': txn_volume[valid]
+        })
         
         # 如果没有找到匹配的交易，尝试从USDT记录反推BTC交易
-        if not transactions:
+        if transactions_df.empty:
             logger.info("没有找到BTC交易记录，尝试从USDT记录反推...")
-            transactions = self._generate_transactions_from_usdt()
+            transactions_df = self._generate_transactions_from_usdt()
         
         # 转换为DataFrame并按日期排序
-        if transactions:
-            transactions_df = pd.DataFrame(transactions)
+        if not transactions_df.empty:
             # 按日期分组，计算每日的总交易
             transactions_df = transactions_df.groupby('date').agg({
                 'txn_volume': 'sum',
@@ -517,7 +818,7 @@ class BinanceTransactionAnalyzer:
             
             # 保存到CSV（只保留README要求的列：date, txn_volume, txn_shares）
             transactions_pyfolio = transactions_df[['txn_volume', 'txn_shares']].copy()
-            transactions_pyfolio.to_csv('transactions_pyfolio.csv')
+            _write_csv(transactions_pyfolio, 'transactions_pyfolio.csv')
             logger.info(f"transactions数据已保存到 transactions_pyfolio.csv，共 {len(transactions_pyfolio)} 条记录")
             
             # 打印交易统计
@@ -532,136 +833,82 @@ class BinanceTransactionAnalyzer:
             pd.DataFrame(columns=['date', 'txn_volume', 'txn_shares']).to_csv('transactions_pyfolio.csv', index=False)
             logger.info("没有有效交易，创建空的transactions_pyfolio.csv")
     
-    def _find_matching_usdt_spend(self, date, btc_amount):
-        """找到匹配的USDT Transaction Spend记录"""
-        # 获取同一天的USDT Transaction Spend记录
-        same_day_usdt = self.raw_data[
-            (self.raw_data['UTC_Time'].dt.date == date) &
-            (self.raw_data['Coin'] == 'USDT') &
-            (self.raw_data['Operation'] == 'Transaction Spend') &
-            (self.raw_data['Account'] != 'Spot Lead')
-        ]
-        
-        if not same_day_usdt.empty:
-            # 使用第一条记录的金额
-            usdt_amount = same_day_usdt.iloc[0]['Change']
-            # 根据README：买入时为正，txn_volume = - Transaction Spend USDT change
-            return -usdt_amount
-        else:
-            # 如果没找到，使用BTC价格估算
-            btc_price = self._get_btc_price_for_date(date)
-            return btc_amount * btc_price
+    def _first_change_by_date(self, mask, utc_date) -> pd.Series:
+        """按日期分组，返回每天第一条匹配记录的Change（以日期为索引）"""
+        return self.raw_data.loc[mask, 'Change'].groupby(utc_date[mask]).first()
     
-    def _find_matching_usdt_revenue(self, date, btc_amount):
-        """找到匹配的USDT Transaction Revenue记录"""
-        # 获取同一天的USDT Transaction Revenue记录
-        same_day_usdt = self.raw_data[
-            (self.raw_data['UTC_Time'].dt.date == date) &
-            (self.raw_data['Coin'] == 'USDT') &
-            (self.raw_data['Operation'] == 'Transaction Revenue') &
-            (self.raw_data['Account'] != 'Spot Lead')
-        ]
-        
-        if not same_day_usdt.empty:
-            # 使用第一条记录的金额
-            usdt_amount = same_day_usdt.iloc[0]['Change']
-            # 根据README：卖出时为负，txn_volume = - Transaction Revenue USDT change
-            return -usdt_amount
+    def _btc_prices_for(self, dates) -> np.ndarray:
+        """批量获取多个日期的BTC价格"""
+        dates = pd.DatetimeIndex(dates)
+        if self.btc_price_data is None or self.btc_price_data.empty:
+            return self._estimate_btc_prices(dates)
+        if self._btc_price_series is not None:
+            prices = self._btc_price_series.reindex(dates).to_numpy(dtype=np.float64)
         else:
-            # 如果没找到，使用BTC价格估算
-            btc_price = self._get_btc_price_for_date(date)
-            return -btc_amount * btc_price
+            prices = np.full(len(dates), np.nan)
+        
+        # 不在预先对齐的价格序列中的日期，一次性按最近日期对齐到价格数据
+        missing = np.isnan(prices)
+        if missing.any():
+            prices[missing] = self.btc_price_data['close'].reindex(
+                dates[missing].normalize(), method='nearest'
+            ).to_numpy(dtype=np.float64)
+        return prices
     
-    def _generate_transactions_from_usdt(self):
+    def _generate_transactions_from_usdt(self) -> pd.DataFrame:
         """从USDT记录反推BTC交易"""
-        transactions = []
-        
         # 获取所有USDT交易记录
         usdt_transactions = self.raw_data[
             (self.raw_data['Coin'] == 'USDT') &
             (self.raw_data['Operation'].isin(['Transaction Spend', 'Transaction Revenue'])) &
             (self.raw_data['Account'] != 'Spot Lead')
-        ].copy()
+        ]
         
-        # 按日期分组处理
-        for date, group in usdt_transactions.groupby(usdt_transactions['UTC_Time'].dt.date):
-            for _, row in group.iterrows():
-                operation = row['Operation']
-                usdt_amount = row['Change']
-                
-                try:
-                    if operation == 'Transaction Spend':
-                        # 买入花费，txn_volume = - Transaction Spend USDT change (正数)
-                        txn_volume = -usdt_amount
-                        # 使用价格估算BTC数量
-                        btc_price = self._get_btc_price_for_date(date)
-                        txn_shares = txn_volume / btc_price if btc_price > 0 else 0
-                    elif operation == 'Transaction Revenue':
-                        # 卖出收入，txn_volume = - Transaction Revenue USDT change (负数)
-                        txn_volume = -usdt_amount
-                        # 使用价格估算BTC数量
-                        btc_price = self._get_btc_price_for_date(date)
-                        txn_shares = txn_volume / btc_price if btc_price > 0 else 0
-                    else:
-                        continue
-                    
-                    # 只记录有效交易
-                    if abs(txn_shares) > 1e-10 and abs(txn_volume) > 1e-10:
-                        transactions.append({
-                            'date': date,
-                            'txn_shares': txn_shares,
-                            'txn_volume': txn_volume
-                        })
-                        
-                except Exception as e:
-                    logger.warning(f"处理USDT交易失败 {date} {operation} {usdt_amount}: {e}")
-                    continue
-        
-        return transactions
+        dates = self._utc_date.loc[usdt_transactions.index]
+        
+        # 买入花费/卖出收入：txn_volume = - Transaction Spend/Revenue USDT change（买入为正，卖出为负）
+        txn_volume = -usdt_transactions['Change'].to_numpy(dtype=np.float64)
+        
+        # 使用价格估算BTC数量
+        btc_prices = self._btc_prices_for(dates)
+        txn_shares = txn_volume / np.where(btc_prices > 0, btc_prices, np.nan)
+        
+        transactions = pd.DataFrame({
+            'date': dates.to_numpy(),
+            'txn_shares': txn_shares,
+            'txn_volume': txn_volume
+        }).dropna()
+        
+        # 只记录有效交易
+        valid_mask = (transactions['txn_shares'].abs() > 1e-10) & (transactions['txn_volume'].abs() > 1e-10)
+        return transactions[valid_mask]
     
     def _generate_positions_pyfolio(self):
         """生成positions数据（pyfolio格式）"""
         logger.info("生成positions数据...")
         
-        positions = []
+        # 按日期计算各资产的价值（整列运算）
+        dpv = self.daily_portfolio_value
+        positions_df = pd.DataFrame({
+            'date': dpv['date'],
+            'USDT': dpv['USDT_balance'],
+            'USD': dpv['other_balance'],  # 将其他稳定币合并到USD
+            'cash': dpv['USDT_balance'].astype(np.float64) + dpv['other_balance'],  # 现金以USDT计
+            'BTC': dpv['BTC_balance'].astype(np.float64) * dpv['BTC_price'],
+            'ETH': dpv['ETH_balance'] * self._get_price_estimate('ETH', None),
+            'BNB': dpv['BNB_balance'] * self._get_price_estimate('BNB', None),
+            'SOL': dpv['SOL_balance'] * self._get_price_estimate('SOL', None)
+        })
         
-        # 按日期计算持仓
-        for _, row in self.daily_portfolio_value.iterrows():
-            date = row['date']
-            
-            # 计算各资产的价值
-            pos_data = {
-                'date': date,
-                'USDT': row['USDT_balance'],
-                'USD': row.get('other_balance', 0.0),  # 将其他稳定币合并到USD
-                'cash': row['USDT_balance'] + row.get('other_balance', 0.0),  # 现金以USDT计
-                'BTC': row['BTC_balance'] * row['BTC_price']
-            }
-            
-            # 添加其他资产价值
-            eth_price = self._get_price_estimate('ETH', date)
-            bnb_price = self._get_price_estimate('BNB', date)
-            sol_price = self._get_price_estimate('SOL', date)
-            
-            pos_data['ETH'] = row.get('ETH_balance', 0.0) * eth_price
-            pos_data['BNB'] = row.get('BNB_balance', 0.0) * bnb_price
-            pos_data['SOL'] = row.get('SOL_balance', 0.0) * sol_price
-            
-            positions.append(pos_data)
-        
-        # 转换为DataFrame并按日期排序
-        positions_df = pd.DataFrame(positions)
         if not positions_df.empty:
             positions_df = positions_df.sort_values('date')
             positions_df.set_index('date', inplace=True)
             # 确保数值列都是正数
-            for col in ['USDT', 'USD', 'cash', 'BTC', 'ETH', 'BNB', 'SOL']:
-                if col in positions_df.columns:
-                    positions_df[col] = positions_df[col].abs()
+            positions_df = positions_df.abs()
             
             # 保存到CSV（只保留README要求的列：date, BTC, cash）
             positions_pyfolio = positions_df[['BTC', 'cash']].copy()
-            positions_pyfolio.to_csv('positions_pyfolio.csv')
+            _write_csv(positions_pyfolio, 'positions_pyfolio.csv')
             logger.info(f"positions数据已保存到 positions_pyfolio.csv，共 {len(positions_pyfolio)} 条记录")
             
             # 打印持仓统计
@@ -695,7 +942,7 @@ class BinanceTransactionAnalyzer:
         if not returns_df.empty:
             returns_df['date'] = pd.to_datetime(returns_df['date']).dt.date
             returns_df.set_index('date', inplace=True)
-            returns_df.to_csv('returns_pyfolio.csv')
+            _write_csv(returns_df, 'returns_pyfolio.csv')
             logger.info(f"returns数据已保存到 returns_pyfolio.csv，共 {len(returns_df)} 条记录")
             
             # 打印收益统计
@@ -724,14 +971,15 @@ class BinanceTransactionAnalyzer:
         
         logger.info("生成pyfolio格式数据...")
         
-        # 1. 生成transactions数据
-        self._generate_transactions_pyfolio()
-        
-        # 2. 生成positions数据
-        self._generate_positions_pyfolio()
-        
-        # 3. 生成returns数据
-        self._generate_returns_pyfolio()
+        # 分别生成transactions、positions、returns数据
+        # 三者只读取分析结果、各自写入不同文件，可以并行执行
+        generators = [
+            self._generate_transactions_pyfolio,
+            self._generate_positions_pyfolio,
+            self._generate_returns_pyfolio
+        ]
+        with ThreadPoolExecutor(max_workers=len(generators)) as executor:
+            list(executor.map(lambda generate: generate(), generators))
         
         logger.info("pyfolio格式数据生成完成")
         
@@ -743,168 +991,177 @@ class BinanceTransactionAnalyzer:
         logger.info("验证pyfolio文件格式...")
         
         try:
-            # 验证transactions文件
-            transactions_df = pd.read_csv('transactions_pyfolio.csv')
-            required_tx_columns = ['txn_volume', 'txn_shares']  # README要求的列
-            missing_tx_columns = [col for col in required_tx_columns if col not in transactions_df.columns]
-            if missing_tx_columns:
-                logger.warning(f"transactions文件缺少列: {missing_tx_columns}")
-            else:
-                logger.info("transactions文件格式正确")
+            # 验证transactions文件（README要求的列）
+            self._check_header('transactions', 'transactions_pyfolio.csv', ['txn_volume', 'txn_shares'])
             
-            # 验证positions文件
-            positions_df = pd.read_csv('positions_pyfolio.csv')
-            required_pos_columns = ['date', 'cash']  # 至少需要这些基本列
-            missing_pos_columns = [col for col in required_pos_columns if col not in positions_df.columns]
-            if missing_pos_columns:
-                logger.warning(f"positions文件缺少列: {missing_pos_columns}")
-            else:
-                logger.info("positions文件格式正确")
+            # 验证positions文件（至少需要这些基本列）
+            self._check_header('positions', 'positions_pyfolio.csv', ['date', 'cash'])
             
             # 验证returns文件
-            returns_df = pd.read_csv('returns_pyfolio.csv')
-            required_ret_columns = ['returns']
-            missing_ret_columns = [col for col in required_ret_columns if col not in returns_df.columns]
-            if missing_ret_columns:
-                logger.warning(f"returns文件缺少列: {missing_ret_columns}")
-            else:
-                logger.info("returns文件格式正确")
+            self._check_header('returns', 'returns_pyfolio.csv', ['returns'])
                 
         except Exception as e:
             logger.error(f"验证pyfolio文件失败: {e}")
     
+    def _value_balances(self, balances: Dict[str, float], date) -> Tuple[pd.Series, float]:
+        """按指定日期的价格计算各资产的USDT价值（只包含非零余额），返回(各资产价值, 总价值)"""
+        assets = [asset for asset, amount in balances.items() if abs(amount) > 1e-8]
+        amounts = np.array([balances[asset] for asset in assets], dtype=np.float64)
+        
+        # 价格表与ASSET_LIST对齐：USDT按1计价，BTC使用当日价格，其他资产使用估算价格；
+        # 未跟踪的资产追加在价格表末尾
+        extra_assets = [asset for asset in assets if asset not in ASSET_CODES]
+        price_map = np.concatenate([PRICE_VEC, PRICE_TABLE.reindex(extra_assets, fill_value=1.0).to_numpy()])
+        price_map[ASSET_CODES['USDT']] = 1.0
+        if 'BTC' in assets:
+            price_map[ASSET_CODES['BTC']] = self._get_btc_price_for_date(date)
+        
+        extra_codes = {asset: len(ASSET_LIST) + i for i, asset in enumerate(extra_assets)}
+        codes = np.array([ASSET_CODES.get(asset, extra_codes.get(asset)) for asset in assets], dtype=np.int64)
+        
+        values, total = _value_by_code(codes, amounts, price_map)
+        return pd.Series(values, index=assets, dtype=np.float64), total
+    
+    def _check_header(self, name: str, path: str, required_columns: List[str]):
+        """只读取CSV表头，检查是否包含必要的列"""
+        columns = pd.read_csv(path, nrows=0).columns
+        missing_columns = [col for col in required_columns if col not in columns]
+        if missing_columns:
+            logger.warning(f"{name}文件缺少列: {missing_columns}")
+        else:
+            logger.info(f"{name}文件格式正确")
+    
     def generate_report(self):
         """生成分析报告"""
         if not hasattr(self, 'return_stats'):
             logger.error("请先运行分析")
             return
         
-        logger.info("=== 币安交易记录分析报告 ===")
+        # 报告只输出日志，INFO级别未启用时跳过全部格式化
+        if not logger.isEnabledFor(logging.INFO):
+            return
+        
+        # 报告日期只取一次，所有估值共用同一个日期（价格缓存也按该日期命中）
+        today = datetime.now().date()
+        
+        # 各行先收集到列表中，最后作为一条日志记录一次性输出
+        lines: List[str] = []
+        lines.append("=== 币安交易记录分析报告 ===")
         
         # 基本统计
-        logger.info("\n=== 基本统计 ===")
-        logger.info(f"交易记录总数: {len(self.raw_data)}")
-        logger.info(f"分析时间范围: {self.raw_data.iloc[0]['UTC_Time']} 到 {self.raw_data.iloc[-1]['UTC_Time']}")
-        logger.info(f"分析天数: {self.return_stats['total_days']}")
+        lines.append("\n=== 基本统计 ===")
+        lines.append(f"交易记录总数: {len(self.raw_data)}")
+        # analyze_transactions已按时间排序，首尾元素即为时间范围
+        utc_time = self.raw_data['UTC_Time']
+        lines.append(f"分析时间范围: {utc_time.iat[0]} 到 {utc_time.iat[-1]}")
+        lines.append(f"分析天数: {self.return_stats['total_days']}")
         
         # 价格数据信息
         if self.btc_price_data is not None and not self.btc_price_data.empty:
-            logger.info(f"BTC价格数据: {len(self.btc_price_data)} 条记录")
-            logger.info(f"BTC价格范围: {self.btc_price_data['close'].min():.2f} - {self.btc_price_data['close'].max():.2f} USDT")
+            lines.append(f"BTC价格数据: {len(self.btc_price_data)} 条记录")
+            lines.append(f"BTC价格范围: {self.btc_price_data['close'].min():.2f} - {self.btc_price_data['close'].max():.2f} USDT")
         else:
-            logger.info("BTC价格数据: 使用估算价格")
+            lines.append("BTC价格数据: 使用估算价格")
         
         # 收益率统计
-        logger.info("\n=== 收益率统计 ===")
-        logger.info(f"总收益率: {self.return_stats['total_return']:.2%}")
+        lines.append("\n=== 收益率统计 ===")
+        lines.append(f"总收益率: {self.return_stats['total_return']:.2%}")
         if self.return_stats['annualized_return'] is not None:
-            logger.info(f"年化收益率: {self.return_stats['annualized_return']:.2%}")
-        logger.info(f"波动率: {self.return_stats['volatility']:.2%}")
-        logger.info(f"最大回撤: {self.return_stats['max_drawdown']:.2%}")
+            lines.append(f"年化收益率: {self.return_stats['annualized_return']:.2%}")
+        lines.append(f"波动率: {self.return_stats['volatility']:.2%}")
+        lines.append(f"最大回撤: {self.return_stats['max_drawdown']:.2%}")
         if self.return_stats['sharpe_ratio'] is not None:
-            logger.info(f"夏普比率: {self.return_stats['sharpe_ratio']:.2f}")
-        logger.info(f"盈利天数: {self.return_stats['positive_days']}")
-        logger.info(f"亏损天数: {self.return_stats['negative_days']}")
+            lines.append(f"夏普比率: {self.return_stats['sharpe_ratio']:.2f}")
+        lines.append(f"盈利天数: {self.return_stats['positive_days']}")
+        lines.append(f"亏损天数: {self.return_stats['negative_days']}")
         if self.return_stats['total_days'] > 0:
-            logger.info(f"胜率: {self.return_stats['positive_days']/self.return_stats['total_days']:.1%}")
+            lines.append(f"胜率: {self.return_stats['positive_days']/self.return_stats['total_days']:.1%}")
         
-        # 资产余额
-        logger.info("\n=== 主账户最终资产余额 ===")
-        total_value_usdt = 0.0
-        for asset, balance in self.asset_balances.items():
-            if abs(balance) > 1e-8:
-                if asset == 'USDT':
-                    value_usdt = balance
-                elif asset == 'BTC':
-                    current_btc_price = self._get_btc_price_for_date(datetime.now().date())
-                    value_usdt = balance * current_btc_price
-                else:
-                    value_usdt = balance * self._get_price_estimate(asset, datetime.now().date())
-                
-                logger.info(f"{asset}: {balance:.8f} (约 {value_usdt:.2f} USDT)")
-                total_value_usdt += value_usdt
+        # 资产余额（按当前日期的价格估值）
+        lines.append("\n=== 主账户最终资产余额 ===")
+        main_values, total_value_usdt = self._value_balances(self.asset_balances, today)
+        for asset, value_usdt in main_values.items():
+            lines.append(f"{asset}: {self.asset_balances[asset]:.8f} (约 {value_usdt:.2f} USDT)")
         
-        logger.info(f"主账户总资产价值: {total_value_usdt:.2f} USDT")
+        lines.append(f"主账户总资产价值: {total_value_usdt:.2f} USDT")
         
         # Spot Lead账户余额
-        logger.info("\n=== Spot Lead账户最终资产余额 ===")
-        spot_lead_total_value = 0.0
-        for asset, balance in self.spot_lead_balances.items():
-            if abs(balance) > 1e-8:
-                if asset == 'USDT':
-                    value_usdt = balance
-                elif asset == 'BTC':
-                    current_btc_price = self._get_btc_price_for_date(datetime.now().date())
-                    value_usdt = balance * current_btc_price
-                else:
-                    value_usdt = balance * self._get_price_estimate(asset, datetime.now().date())
-                
-                logger.info(f"{asset}: {balance:.8f} (约 {value_usdt:.2f} USDT)")
-                spot_lead_total_value += value_usdt
-        
-        logger.info(f"Spot Lead账户总资产价值: {spot_lead_total_value:.2f} USDT")
-        logger.info(f"两个账户总价值: {total_value_usdt + spot_lead_total_value:.2f} USDT")
+        lines.append("\n=== Spot Lead账户最终资产余额 ===")
+        spot_lead_values, spot_lead_total_value = self._value_balances(self.spot_lead_balances, today)
+        for asset, value_usdt in spot_lead_values.items():
+            lines.append(f"{asset}: {self.spot_lead_balances[asset]:.8f} (约 {value_usdt:.2f} USDT)")
+        
+        lines.append(f"Spot Lead账户总资产价值: {spot_lead_total_value:.2f} USDT")
+        lines.append(f"两个账户总价值: {total_value_usdt + spot_lead_total_value:.2f} USDT")
+        
+        # 按账户和操作类型一次性汇总金额和笔数，以下各项统计都从该结果派生；
+        # 保留账户或操作类型为空的记录，按单一层级统计笔数时才按value_counts的方式各自排除空值
+        summary = self.raw_data.groupby(['Account', 'Operation'], observed=True, dropna=False)['Change'].agg(
+            total='sum', count='size'
+        )
+        
+        def summary_for(account, operation):
+            """获取指定账户和操作类型的(总金额, 笔数)"""
+            if (account, operation) in summary.index:
+                row = summary.loc[(account, operation)]
+                return row['total'], int(row['count'])
+            return 0.0, 0
         
         # 交易类型分析
-        logger.info("\n=== 交易类型分析 ===")
-        operation_counts = self.raw_data['Operation'].value_counts()
-        for operation, count in operation_counts.items():
-            logger.info(f"{operation}: {count}")
+        lines.append("\n=== 交易类型分析 ===")
+        operation_counts = summary['count'].groupby(level='Operation', observed=True).sum().sort_values(ascending=False)
+        lines.append(operation_counts.rename_axis(None).to_string())
         
         # 账户分析
-        logger.info("\n=== 账户分析 ===")
-        account_counts = self.raw_data['Account'].value_counts()
-        for account, count in account_counts.items():
-            logger.info(f"{account}: {count} 笔交易")
-        
-        # 币单收益分析
-        copy_trade_data = self.raw_data[self.raw_data['Operation'].str.contains('Copy Portfolio', na=False)]
-        if not copy_trade_data.empty:
-            copy_profit = copy_trade_data[copy_trade_data['Operation'].str.contains('Profit Sharing', na=False)]
-            if not copy_profit.empty:
-                total_copy_profit = copy_profit['Change'].sum()
-                logger.info(f"\n=== 币单收益 ===")
-                logger.info(f"总带单收益: {total_copy_profit:.2f} USDT")
-                logger.info(f"带单收益笔数: {len(copy_profit)}")
+        lines.append("\n=== 账户分析 ===")
+        account_counts = summary['count'].groupby(level='Account', observed=True).sum().sort_values(ascending=False)
+        lines.append(account_counts.rename_axis(None).to_string())
+        
+        # 币单收益分析（只在操作类型取值上做子串匹配）
+        copy_profit_ops = [
+            op for op in operation_counts.index if 'Copy Portfolio' in op and 'Profit Sharing' in op
+        ]
+        copy_profit = summary[summary.index.get_level_values('Operation').isin(copy_profit_ops)]
+        if not copy_profit.empty:
+            total_copy_profit = copy_profit['total'].sum()
+            lines.append(f"\n=== 币单收益 ===")
+            lines.append(f"总带单收益: {total_copy_profit:.2f} USDT")
+            lines.append(f"带单收益笔数: {copy_profit['count'].sum()}")
         
         # 期货交易分析
-        futures_data = self.raw_data[self.raw_data['Account'] == 'USD-M Futures']
-        if not futures_data.empty:
-            funding_fees = futures_data[futures_data['Operation'] == 'Funding Fee']
-            if not funding_fees.empty:
-                total_funding_fee = funding_fees['Change'].sum()
-                pnl_trades = futures_data[futures_data['Operation'] == 'Realized Profit and Loss']
-                total_pnl = pnl_trades['Change'].sum() if not pnl_trades.empty else 0
-                
-                logger.info(f"\n=== 期货交易 ===")
-                logger.info(f"总资金费用: {total_funding_fee:.2f} USDT")
-                logger.info(f"总已实现盈亏: {total_pnl:.2f} USDT")
-                logger.info(f"资金费用笔数: {len(funding_fees)}")
-                logger.info(f"已实现盈亏笔数: {len(pnl_trades)}")
+        total_funding_fee, funding_fee_count = summary_for('USD-M Futures', 'Funding Fee')
+        if funding_fee_count > 0:
+            total_pnl, pnl_count = summary_for('USD-M Futures', 'Realized Profit and Loss')
+            
+            lines.append(f"\n=== 期货交易 ===")
+            lines.append(f"总资金费用: {total_funding_fee:.2f} USDT")
+            lines.append(f"总已实现盈亏: {total_pnl:.2f} USDT")
+            lines.append(f"资金费用笔数: {funding_fee_count}")
+            lines.append(f"已实现盈亏笔数: {pnl_count}")
+        
+        logger.info('\n'.join(lines))
     
     def save_results(self):
         """保存分析结果"""
         if self.daily_portfolio_value is not None:
             # 保存投资组合价值数据（包含BTC价格）
-            self.daily_portfolio_value.to_csv('portfolio_value_with_prices.csv', index=False)
-            logger.info("投资组合价值数据已保存到 portfolio_value_with_prices.csv")
-        
-        # 保存资产余额
-        balance_data = []
-        for asset, balance in self.asset_balances.items():
-            balance_data.append({'Asset': asset, 'Balance': balance, 'Account': 'Main'})
-        
-        for asset, balance in self.spot_lead_balances.items():
-            balance_data.append({'Asset': asset, 'Balance': balance, 'Account': 'Spot Lead'})
-        
-        balance_df = pd.DataFrame(balance_data)
-        balance_df.to_csv('final_balances.csv', index=False)
+            paths = _save_output(self.daily_portfolio_value, 'portfolio_value_with_prices', index=False)
+            logger.info(f"投资组合价值数据已保存到 {', '.join(paths)}")
+        
+        # 保存资产余额（数据量很小，直接用csv.writer写出，无需构建DataFrame）
+        with open('final_balances.csv', 'w', newline='', buffering=1 << 20) as f:
+            writer = csv.writer(f)
+            writer.writerow(['Asset', 'Balance', 'Account'])
+            writer.writerows(itertools.chain(
+                ((asset, balance, 'Main') for asset, balance in self.asset_balances.items()),
+                ((asset, balance, 'Spot Lead') for asset, balance in self.spot_lead_balances.items()),
+            ))
         logger.info("最终资产余额已保存到 final_balances.csv")
         
         # 保存BTC价格数据
         if self.btc_price_data is not None and not self.btc_price_data.empty:
-            self.btc_price_data.to_csv('btc_price_data.csv')
-            logger.info("BTC价格数据已保存到 btc_price_data.csv")
+            paths = _save_output(self.btc_price_data, 'btc_price_data')
+            logger.info(f"BTC价格数据已保存到 {', '.join(paths)}")
         
         # 保存详细的分析结果
         if hasattr(self, 'return_stats'):
@@ -915,50 +1172,51 @@ class BinanceTransactionAnalyzer:
     def plot_results(self):
         """生成可视化图表"""
         try:
-            plt.style.use('seaborn-v0_8')
-            fig, axes = plt.subplots(3, 2, figsize=(18, 15))
-            
             if self.daily_portfolio_value is None or self.daily_portfolio_value.empty:
                 logger.warning("没有投资组合价值数据，跳过图表生成")
                 return
             
+            fig, axes = plt.subplots(3, 2, figsize=(18, 15), constrained_layout=True)
+            
+            # 预先取出绘图用的NumPy数组，各子图共用同一份数据
+            df = self.daily_portfolio_value
+            dates = df['date'].to_numpy()
+            portfolio_values = df['portfolio_value'].to_numpy()
+            btc_prices = df['BTC_price'].to_numpy()
+            portfolio_btc_ratio = portfolio_values / btc_prices
+            daily_returns = df['daily_return'].dropna().to_numpy()
+            
             # 投资组合价值变化
             ax1 = axes[0, 0]
-            ax1.plot(self.daily_portfolio_value['date'], self.daily_portfolio_value['portfolio_value'], 
-                    label='Portfolio Value', color='blue')
+            ax1.plot(dates, portfolio_values, label='Portfolio Value', color='blue')
             ax1.set_title('Portfolio Value Change')
             ax1.set_xlabel('Date')
             ax1.set_ylabel('Value (USDT)')
-            ax1.grid(True)
             ax1.legend()
             
             # BTC价格变化
             ax2 = axes[0, 1]
-            ax2.plot(self.daily_portfolio_value['date'], self.daily_portfolio_value['BTC_price'], 
-                    label='BTC Price', color='orange')
+            ax2.plot(dates, btc_prices, label='BTC Price', color='orange')
             ax2.set_title('BTC Price Change')
             ax2.set_xlabel('Date')
             ax2.set_ylabel('Price (USDT)')
-            ax2.grid(True)
             ax2.legend()
             
             # 日收益率分布
             ax3 = axes[1, 0]
-            ax3.hist(self.daily_portfolio_value['daily_return'].dropna(), bins=50, color='green', alpha=0.7)
+            ax3.hist(daily_returns, bins=50, color='green', alpha=0.7)
             ax3.set_title('Daily Return Distribution')
             ax3.set_xlabel('Return')
             ax3.set_ylabel('Frequency')
-            ax3.grid(True)
             
             # 累计收益率
             ax4 = axes[1, 1]
-            if 'cumulative_return' in self.daily_portfolio_value.columns:
-                ax4.plot(self.daily_portfolio_value['date'], self.daily_portfolio_value['cumulative_return'] * 100, 
+            if 'cumulative_return' in df.columns:
+                ax4.plot(dates, df['cumulative_return'].to_numpy() * 100, 
                         label='Cumulative Return', color='red')
                 ax4.set_title('Cumulative Return')
                 ax4.set_xlabel('Date')
                 ax4.set_ylabel('Return (%)')
-                ax4.grid(True)
                 ax4.legend()
             else:
                 ax4.text(0.5, 0.5, 'No cumulative return data', ha='center', va='center', transform=ax4.transAxes)
@@ -966,51 +1224,41 @@ class BinanceTransactionAnalyzer:
             
             # 投资组合价值 vs BTC价格
             ax5 = axes[2, 0]
-            ax5.plot(self.daily_portfolio_value['date'], self.daily_portfolio_value['portfolio_value'], 
-                    'b-', label='Portfolio Value', color='blue')
-            ax5.plot(self.daily_portfolio_value['date'], 
-                    self.daily_portfolio_value['portfolio_value'] / self.daily_portfolio_value['BTC_price'], 
-                    'r--', label='Portfolio/BTC Ratio', color='purple')
+            ax5.plot(dates, portfolio_values, '-', label='Portfolio Value', color='blue')
+            ax5.plot(dates, portfolio_btc_ratio, '--', label='Portfolio/BTC Ratio', color='purple')
             ax5.set_title('Portfolio Value vs BTC Price')
             ax5.set_xlabel('Date')
             ax5.set_ylabel('Value (USDT)')
-            ax5.grid(True)
             ax5.legend()
             
             # Asset Allocation (Pie Chart)
             ax6 = axes[2, 1]
-            asset_values = []
-            asset_names = []
             
             # Calculate current value of each asset for both accounts
-            current_date = self.daily_portfolio_value['date'].iloc[-1]
-            current_btc_price = self._get_btc_price_for_date(current_date)
+            current_date = df['date'].iat[-1]
             
             # 合并两个账户的资产
-            combined_balances = self.asset_balances.copy()
-            for asset, balance in self.spot_lead_balances.items():
-                combined_balances[asset] = combined_balances.get(asset, 0.0) + balance
+            main_balances = pd.Series(self.asset_balances, dtype='float64')
+            lead_balances = pd.Series(self.spot_lead_balances, dtype='float64')
+            combined_balances = main_balances.add(lead_balances, fill_value=0.0)
             
-            for asset, balance in combined_balances.items():
-                if abs(balance) > 1e-8:
-                    if asset == 'USDT':
-                        value = balance
-                    elif asset == 'BTC':
-                        value = balance * current_btc_price
-                    else:
-                        value = balance * self._get_price_estimate(asset, current_date)
-                    
-                    if value > 0:
-                        asset_values.append(value)
-                        asset_names.append(f"{asset}\n({value:.0f} USDT)")
+            values, _ = self._value_balances(combined_balances.to_dict(), current_date)
+            values = values[values > 0]
+            asset_values = values.to_numpy()
+            percentages = asset_values / asset_values.sum() * 100 if asset_values.size else asset_values
+            asset_names = [
+                f"{asset}\n({value:.0f} USDT, {pct:.1f}%)"
+                for asset, value, pct in zip(values.index, asset_values, percentages)
+            ]
             
-            if asset_values:
-                ax6.pie(asset_values, labels=asset_names, autopct='%1.1f%%')
+            if asset_values.size:
+                ax6.pie(asset_values, labels=asset_names, wedgeprops={'linewidth': 0})
                 ax6.set_title('Asset Allocation (Combined Accounts)')
             
-            plt.tight_layout()
-            plt.savefig('portfolio_analysis_enhanced.png', dpi=300, bbox_inches='tight')
-            plt.show()
+            fig.savefig('portfolio_analysis_enhanced.png', dpi=150, bbox_inches='tight', pil_kwargs={'optimize': True})
+            if os.environ.get('SHOW_PLOTS'):
+                plt.show()
+            plt.close(fig)
             logger.info("图表已保存到 portfolio_analysis_enhanced.png")
             
         except Exception as e:
@@ -1,118 +1,140 @@
+import os
 import pandas as pd
 import numpy as np
 from datetime import datetime
 
-def analyze_returns_anomalies():
+def load_pyfolio_frame(csv_path):
+    """读取pyfolio CSV文件（日期为索引），优先使用不旧于CSV的同名Parquet文件"""
+    # 与生成CSV时一并写出的Parquet文件同名，读取CSV后也保存到这里
+    parquet_path = os.path.splitext(csv_path)[0] + '.parquet'
+    if os.path.exists(parquet_path) and os.path.getmtime(parquet_path) >= os.path.getmtime(csv_path):
+        return pd.read_parquet(parquet_path)
+    
+    df = pd.read_csv(csv_path, index_col=0, parse_dates=True)
+    try:
+        df.to_parquet(parquet_path)
+    except Exception as e:  # 没有安装Parquet引擎或写入失败时不缓存
+        print(f"保存缓存 {parquet_path} 失败: {e}")
+    return df
+
+def analyze_returns_anomalies(returns_df, positions_df):
     """分析收益率异常值"""
     print("=== 分析收益率异常值 ===")
     
-    # 读取收益率数据
-    returns_df = pd.read_csv('returns_pyfolio.csv', index_col=0, parse_dates=True)
-    
-    # 读取持仓数据
-    positions_df = pd.read_csv('positions_pyfolio.csv', index_col=0, parse_dates=True)
-    
-    # 找出异常值（收益率绝对值大于1）
-    anomalies = returns_df[abs(returns_df['return']) > 1].copy()
-    print(f"\n发现 {len(anomalies)} 个异常收益率值：")
-    for date, row in anomalies.iterrows():
-        print(f"{date.date()}: {row['return']:.2%}")
+    # 找出异常值（收益率绝对值大于1），只保留其整数位置，不复制数据
+    returns = returns_df['return']
+    return_values = returns.to_numpy()
+    anomaly_pos = np.flatnonzero(np.abs(return_values) > 1)
+    anomaly_dates = returns_df.index[anomaly_pos]
+    print(f"\n发现 {len(anomaly_pos)} 个异常收益率值：")
+    for date, value in zip(anomaly_dates, return_values[anomaly_pos]):
+        print(f"{date.date()}: {value:.2%}")
     
     # 分析每个异常日期前后的数据
     print("\n=== 异常日期详细分析 ===")
-    for anomaly_date in anomalies.index:
+    
+    # 所有异常日期前后3天窗口的边界通过一次二分查找得到
+    start_dates = anomaly_dates - pd.Timedelta(days=3)
+    end_dates = anomaly_dates + pd.Timedelta(days=3)
+    returns_start = returns_df.index.searchsorted(start_dates, side='left')
+    returns_end = returns_df.index.searchsorted(end_dates, side='right')
+    positions_start = positions_df.index.searchsorted(start_dates, side='left')
+    positions_end = positions_df.index.searchsorted(end_dates, side='right')
+    
+    position_values = positions_df.drop(columns='date', errors='ignore')
+    
+    for anomaly_date, r_start, r_end, p_start, p_end in zip(
+        anomaly_dates, returns_start, returns_end, positions_start, positions_end
+    ):
         print(f"\n--- {anomaly_date.date()} ---")
         
-        # 获取异常日期前后3天的数据
-        start_date = anomaly_date - pd.Timedelta(days=3)
-        end_date = anomaly_date + pd.Timedelta(days=3)
-        
-        # 收益率数据
-        returns_window = returns_df.loc[start_date:end_date]
+        # 收益率数据（只显示绝对值大于10%的）
+        returns_window = returns.iloc[r_start:r_end]
         print("\n收益率窗口：")
-        for date, row in returns_window.iterrows():
-            if abs(row['return']) > 0.1:  # 只显示绝对值大于10%的
-                print(f"  {date.date()}: {row['return']:.2%}")
+        for date, value in returns_window[returns_window.abs() > 0.1].items():
+            print(f"  {date.date()}: {value:.2%}")
         
         # 持仓数据
-        positions_window = positions_df.loc[start_date:end_date]
+        positions_window = position_values.iloc[p_start:p_end]
         print("\n持仓数据（只显示有变化的资产）：")
         
-        # 找出有变化的列
-        for col in positions_window.columns:
-            if col == 'date':
-                continue
-            values = positions_window[col]
-            if not values.isna().all():  # 如果列中有非空值
-                non_null_values = values.dropna()
-                if len(non_null_values) > 1:  # 如果有多个非空值
-                    changes = non_null_values.diff().dropna()
-                    if any(abs(changes) > 0.01):  # 如果有显著变化
-                        print(f"  {col}:")
-                        for date, value in non_null_values.items():
-                            if pd.notna(value):
-                                print(f"    {date.date()}: {value:.6f}")
+        # 相邻非空值之间有显著变化的列（前向填充后空值处的差为0），在NumPy数组上一次性对所有列做差分
+        window_arr = positions_window.ffill().to_numpy()
+        changed = (np.abs(np.diff(window_arr, axis=0)) > 0.01).any(axis=0)
+        for col in positions_window.columns[changed]:
+            print(f"  {col}:")
+            for date, value in positions_window[col].dropna().items():
+                print(f"    {date.date()}: {value:.6f}")
 
-def analyze_positions_calculation():
+def analyze_positions_calculation(positions_df):
     """分析持仓计算逻辑"""
     print("\n=== 分析持仓计算逻辑 ===")
     
-    # 读取持仓数据
-    positions_df = pd.read_csv('positions_pyfolio.csv', index_col=0, parse_dates=True)
-    
     print(f"持仓数据形状: {positions_df.shape}")
     print(f"日期范围: {positions_df.index.min()} 到 {positions_df.index.max()}")
     print(f"资产列: {list(positions_df.columns)}")
     
-    # 检查每个资产的统计信息
-    for asset in positions_df.columns:
-        if asset == 'date':
-            continue
-        values = positions_df[asset].dropna()
-        if len(values) > 0:
+    # 一次性计算所有资产列的统计信息
+    values = positions_df.drop(columns='date', errors='ignore')
+    stats = values.agg(['count', 'min', 'max', 'mean', 'std'])
+    
+    # 检查是否有极端值（按列广播阈值），只保留极端值的(日期, 资产)
+    extreme_threshold = stats.loc['mean'] + 3 * stats.loc['std']
+    extreme_values = values.where(values.abs().gt(extreme_threshold, axis=1)).stack().dropna()
+    extremes_by_asset = {asset: s.droplevel(1) for asset, s in extreme_values.groupby(level=1)}
+    
+    for asset in values.columns:
+        if stats.at['count', asset] > 0:
             print(f"\n{asset} 统计:")
-            print(f"  非空值数量: {len(values)}")
-            print(f"  最小值: {values.min():.6f}")
-            print(f"  最大值: {values.max():.6f}")
-            print(f"  平均值: {values.mean():.6f}")
-            print(f"  标准差: {values.std():.6f}")
+            print(f"  非空值数量: {int(stats.at['count', asset])}")
+            print(f"  最小值: {stats.at['min', asset]:.6f}")
+            print(f"  最大值: {stats.at['max', asset]:.6f}")
+            print(f"  平均值: {stats.at['mean', asset]:.6f}")
+            print(f"  标准差: {stats.at['std', asset]:.6f}")
             
-            # 检查是否有极端值
-            extreme_threshold = values.mean() + 3 * values.std()
-            extremes = values[abs(values) > extreme_threshold]
-            if len(extremes) > 0:
-                print(f"  极端值 (> {extreme_threshold:.6f}):")
+            extremes = extremes_by_asset.get(asset)
+            if extremes is not None and len(extremes) > 0:
+                print(f"  极端值 (> {extreme_threshold[asset]:.6f}):")
                 for date, value in extremes.items():
                     print(f"    {date.date()}: {value:.6f}")
 
-def check_portfolio_values():
+def check_portfolio_values(positions_df):
     """检查投资组合价值计算"""
     print("\n=== 检查投资组合价值 ===")
     
-    # 读取持仓数据
-    positions_df = pd.read_csv('positions_pyfolio.csv', index_col=0, parse_dates=True)
-    
     # 计算每日投资组合总价值
     portfolio_values = positions_df.sum(axis=1)
+    # 统计量只计算一次，供打印和极端变化阈值共用
+    pv_mean = float(portfolio_values.mean())
+    pv_std = float(portfolio_values.std())
     
     print(f"投资组合价值统计:")
     print(f"  最小值: {portfolio_values.min():.2f}")
     print(f"  最大值: {portfolio_values.max():.2f}")
-    print(f"  平均值: {portfolio_values.mean():.2f}")
-    print(f"  标准差: {portfolio_values.std():.2f}")
+    print(f"  平均值: {pv_mean:.2f}")
+    print(f"  标准差: {pv_std:.2f}")
     
-    # 找出价值变化最大的日期
-    value_changes = portfolio_values.diff().dropna()
-    extreme_changes = value_changes[abs(value_changes) > portfolio_values.mean()]
+    # 找出价值变化最大的日期（前一行的价值直接通过shift获得，无需逐日期查找）
+    prev_values = portfolio_values.shift(1)
+    value_changes = portfolio_values - prev_values
+    extreme_mask = value_changes.abs() > pv_mean
+    report = pd.DataFrame({
+        'prev': prev_values[extreme_mask],
+        'curr': portfolio_values[extreme_mask],
+        'change': value_changes[extreme_mask],
+    })
+    report['pct'] = report['change'] / report['prev']
     
-    if len(extreme_changes) > 0:
-        print(f"\n极端价值变化日期 (变化 > {portfolio_values.mean():.2f}):")
-        for date, change in extreme_changes.items():
-            prev_value = portfolio_values.loc[date - pd.Timedelta(days=1)]
-            curr_value = portfolio_values.loc[date]
-            print(f"  {date.date()}: {prev_value:.2f} -> {curr_value:.2f} (变化: {change:.2f}, {change/prev_value:.2%})")
+    if len(report) > 0:
+        print(f"\n极端价值变化日期 (变化 > {pv_mean:.2f}):")
+        for date, prev_value, curr_value, change, pct in report.itertuples():
+            print(f"  {date.date()}: {prev_value:.2f} -> {curr_value:.2f} (变化: {change:.2f}, {pct:.2%})")
 
 if __name__ == "__main__":
-    analyze_returns_anomalies()
-    analyze_positions_calculation()
-    check_portfolio_values()
+    # 收益率和持仓数据只读取一次，供各项分析共用
+    returns_df = load_pyfolio_frame('returns_pyfolio.csv')
+    positions_df = load_pyfolio_frame('positions_pyfolio.csv')
+    
+    analyze_returns_anomalies(returns_df, positions_df)
+    analyze_positions_calculation(positions_df)
+    check_portfolio_values(positions_df)
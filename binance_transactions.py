@@ -18,6 +18,19 @@ import ccxt
 from dotenv import load_dotenv
 import logging
 import requests
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:  # numba为可选依赖，不可用时以纯Python方式执行同一个内核
+    NUMBA_AVAILABLE = False
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:  # orjson为可选依赖，不可用时使用requests自带的JSON解析
+    ORJSON_AVAILABLE = False
 
 # 配置日志
 logging.basicConfig(
@@ -30,11 +43,66 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# BTC/USDT日线K线的本地缓存文件（Parquet格式，保留数值类型和带时区的日期索引）
+BTC_PRICE_CACHE = 'btc_ohlcv.parquet'
+
+
+def _walk_daily_positions(delta_day, delta_asset, delta_amount, prices, cash_col, initial_cash):
+    """逐日推演各资产数量并按当日价格计算持仓价值
+
+    delta_*为按日期序号排序的(日期序号, 资产列号, 数量变化)数组，prices为(天数, 资产数)的每日价格矩阵（无效价格为0）。
+    非现金资产每日从前一日的价值按前一日价格反推数量（数量非正或价格无效时归零），现金直接继承前一日不低于0的余额。
+    返回(天数, 资产数)的每日持仓价值
+    """
+    n_days, n_assets = prices.shape
+    values = np.zeros((n_days, n_assets))
+    quantities = np.zeros(n_assets)
+    quantities[cash_col] = initial_cash
+    k = 0
+    for i in range(n_days):
+        if i > 0:
+            for j in range(n_assets):
+                prev_value = values[i - 1, j]
+                if j == cash_col:
+                    quantities[j] = prev_value
+                elif prev_value > 0.0 and prices[i - 1, j] > 0.0:
+                    quantities[j] = prev_value / prices[i - 1, j]
+                else:
+                    quantities[j] = 0.0
+        
+        # 当日的所有数量变化
+        while k < delta_day.shape[0] and delta_day[k] == i:
+            quantities[delta_asset[k]] += delta_amount[k]
+            k += 1
+        
+        for j in range(n_assets):
+            quantity = quantities[j]
+            if j == cash_col:
+                values[i, j] = quantity if quantity > 0.0 else 0.0
+            elif quantity > 0.0 and prices[i, j] > 0.0:
+                values[i, j] = quantity * prices[i, j]
+            else:
+                values[i, j] = 0.0
+    return values
+
+if NUMBA_AVAILABLE:
+    _walk_daily_positions = njit(cache=True)(_walk_daily_positions)
+
 class BinanceTransactions:
-    def __init__(self):
-        """初始化币安API连接"""
+    def __init__(self, check_permissions=None):
+        """
+        初始化币安API连接
+        
+        Args:
+            check_permissions (bool): 启动时是否逐项检查API权限（会额外发出多次认证请求）；
+                为None时读取环境变量BINANCE_CHECK_PERMS（为1时检查）
+        """
         load_dotenv()
         
+        if check_permissions is None:
+            check_permissions = os.getenv('BINANCE_CHECK_PERMS', '0') == '1'
+        self.check_permissions = check_permissions
+        
         # 获取主账户API密钥（用于获取充值提现记录）
         main_api_key = os.getenv('BINANCE_API_KEY')
         main_secret_key = os.getenv('BINANCE_SECRET_KEY')
@@ -148,9 +216,11 @@ class BinanceTransactions:
                     self.exchange = self.main_exchange
                     self.copytrade_exchange = None
             
-            # 使用当前活跃的交易所检查API权限
-            logger.info(f"使用 {'带单项目API' if self.copytrade_exchange else '主账户API'} 检查权限...")
-            self._check_api_permissions()
+            # 使用当前活跃的交易所检查API权限（诊断用，默认跳过）
+            if self.check_permissions:
+                logger.info(f"使用 {'带单项目API' if self.copytrade_exchange else '主账户API'} 检查权限...")
+                # 当前活跃交易所的余额已在上面获取过，无需再次请求
+                self._check_api_permissions(balance_checked=True)
             
         except ccxt.AuthenticationError as e:
             logger.error(f"API认证失败: {e}")
@@ -173,8 +243,13 @@ class BinanceTransactions:
             logger.error(f"错误类型: {type(e).__name__}")
             raise
     
-    def _check_api_permissions(self):
-        """检查API权限"""
+    def _check_api_permissions(self, balance_checked=False):
+        """
+        检查API权限
+        
+        Args:
+            balance_checked (bool): 当前交易所的余额是否已经成功获取过（为True时跳过余额权限检查）
+        """
         try:
             logger.info("检查API权限...")
             
@@ -183,7 +258,7 @@ class BinanceTransactions:
                 account_info = self.exchange.fetch_account()
                 logger.info("✓ 账户信息权限 - 正常")
             except Exception as e:
-                logger.warning(f"✗ 账户信息权限 - 失败: {e}")
+                logger.warning("✗ 账户信息权限 - 失败: %s", e)
             
             # 检查交易历史权限
             try:
@@ -191,24 +266,27 @@ class BinanceTransactions:
                 trades = self.exchange.fetch_my_trades('BTC/USDT', limit=1)
                 logger.info("✓ 交易历史权限 - 正常")
             except Exception as e:
-                logger.warning(f"✗ 交易历史权限 - 失败: {e}")
+                logger.warning("✗ 交易历史权限 - 失败: %s", e)
             
             # 检查订单权限
             try:
                 orders = self.exchange.fetch_orders('BTC/USDT', limit=1)
                 logger.info("✓ 订单权限 - 正常")
             except Exception as e:
-                logger.warning(f"✗ 订单权限 - 失败: {e}")
+                logger.warning("✗ 订单权限 - 失败: %s", e)
             
             # 检查余额权限
-            try:
-                balance = self.exchange.fetch_balance()
+            if balance_checked:
                 logger.info("✓ 余额权限 - 正常")
-            except Exception as e:
-                logger.warning(f"✗ 余额权限 - 失败: {e}")
+            else:
+                try:
+                    balance = self.exchange.fetch_balance()
+                    logger.info("✓ 余额权限 - 正常")
+                except Exception as e:
+                    logger.warning("✗ 余额权限 - 失败: %s", e)
                 
         except Exception as e:
-            logger.warning(f"权限检查过程中出错: {e}")
+            logger.warning("权限检查过程中出错: %s", e)
     
     def get_all_transactions(self, symbol=None, since=None, limit=None, days=None):
         """
@@ -238,24 +316,30 @@ class BinanceTransactions:
             # 如果没有指定交易对，尝试获取主要交易对的交易记录
             if not symbol:
                 major_symbols = ['BTC/USDT', 'ETH/USDT', 'BNB/USDT', 'ADA/USDT', 'SOL/USDT']
-                all_transactions = []
                 
-                for sym in major_symbols:
+                def fetch_symbol(sym):
                     try:
-                        logger.debug(f"尝试获取 {sym} 的交易记录")
-                        sym_transactions = self._get_transactions_with_pagination(sym, since, limit)
-                        if sym_transactions:
-                            all_transactions.extend(sym_transactions)
-                            logger.info(f"获取到 {sym} 的 {len(sym_transactions)} 条交易记录")
+                        logger.debug("尝试获取 %s 的交易记录", sym)
+                        return self._get_transactions_with_pagination(sym, since, limit)
                     except Exception as e:
-                        logger.debug(f"获取 {sym} 交易记录失败: {e}")
-                        continue
+                        logger.debug("获取 %s 交易记录失败: %s", sym, e)
+                        return []
+                
+                # 各交易对的请求主要是网络等待，并发发出（结果按交易对顺序合并）
+                with ThreadPoolExecutor(max_workers=len(major_symbols)) as executor:
+                    results = list(executor.map(fetch_symbol, major_symbols))
                 
-                logger.info(f"总共获取到 {len(all_transactions)} 条交易记录")
+                all_transactions = []
+                for sym, sym_transactions in zip(major_symbols, results):
+                    if sym_transactions:
+                        all_transactions.extend(sym_transactions)
+                        logger.info("获取到 %s 的 %s 条交易记录", sym, len(sym_transactions))
+                
+                logger.info("总共获取到 %s 条交易记录", len(all_transactions))
                 return all_transactions
             else:
                 # 指定了交易对，使用分页获取
-                logger.debug(f"使用分页获取交易记录，参数: symbol={symbol}, since={since}, limit={limit}")
+                logger.debug("使用分页获取交易记录，参数: symbol=%s, since=%s, limit=%s", symbol, since, limit)
                 transactions = self._get_transactions_with_pagination(symbol, since, limit)
                 
                 # 验证返回的数据
@@ -264,15 +348,15 @@ class BinanceTransactions:
                     return []
                 
                 if not isinstance(transactions, list):
-                    logger.warning(f"分页获取交易记录返回非列表类型: {type(transactions)}，返回空列表")
+                    logger.warning("分页获取交易记录返回非列表类型: %s，返回空列表", type(transactions))
                     return []
                 
-                logger.info(f"分页获取到 {len(transactions)} 条交易记录")
+                logger.info("分页获取到 %s 条交易记录", len(transactions))
                 return transactions
                 
         except Exception as e:
-            logger.error(f"获取交易记录失败: {e}")
-            logger.debug(f"错误详情: {type(e).__name__}: {str(e)}")
+            logger.error("获取交易记录失败: %s", e)
+            logger.debug("错误详情: %s: %s", type(e).__name__, e)
             return []
     
     def _get_transactions_with_pagination(self, symbol, since, limit=1000):
@@ -295,7 +379,7 @@ class BinanceTransactions:
         while True:
             try:
                 page_count += 1
-                logger.debug(f"获取第 {page_count} 页交易记录...")
+                logger.debug("获取第 %s 页交易记录...", page_count)
                 
                 # 构建请求参数
                 params = {
@@ -312,32 +396,32 @@ class BinanceTransactions:
                 transactions = self.exchange.fetch_my_trades(**params)
                 
                 if not transactions:
-                    logger.debug(f"第 {page_count} 页没有交易记录，停止分页")
+                    logger.debug("第 %s 页没有交易记录，停止分页", page_count)
                     break
                 
                 # 添加到总列表
                 all_transactions.extend(transactions)
-                logger.debug(f"第 {page_count} 页获取到 {len(transactions)} 条交易记录")
+                logger.debug("第 %s 页获取到 %s 条交易记录", page_count, len(transactions))
                 
                 # 检查是否还有更多数据
                 if len(transactions) < limit:
-                    logger.debug(f"第 {page_count} 页数据不足 {limit} 条，表示已经是最后一页")
+                    logger.debug("第 %s 页数据不足 %s 条，表示已经是最后一页", page_count, limit)
                     break
                 
                 # 获取最后一条记录的ID，用于下一页
                 last_transaction = transactions[-1]
                 if 'id' in last_transaction:
                     from_id = int(last_transaction['id']) + 1
-                    logger.debug(f"下一页从ID {from_id} 开始")
+                    logger.debug("下一页从ID %s 开始", from_id)
                 else:
                     # 如果没有ID字段，使用时间戳分页
                     last_timestamp = last_transaction['timestamp']
                     from_id = last_timestamp + 1
-                    logger.debug(f"使用时间戳分页，下一页从时间戳 {from_id} 开始")
+                    logger.debug("使用时间戳分页，下一页从时间戳 %s 开始", from_id)
                 
                 # 防止无限循环
                 if page_count >= max_pages:
-                    logger.warning(f"已达到最大页数限制 {max_pages}，停止分页")
+                    logger.warning("已达到最大页数限制 %s，停止分页", max_pages)
                     break
                 
                 # 添加延迟避免API限制
@@ -345,32 +429,22 @@ class BinanceTransactions:
                 time.sleep(0.1)  # 100ms延迟
                 
             except ccxt.RateLimitExceeded as e:
-                logger.warning(f"遇到API限制，等待后重试: {e}")
+                logger.warning("遇到API限制，等待后重试: %s", e)
                 import time
                 time.sleep(1)  # 等待1秒后重试
                 continue
             except Exception as e:
-                logger.error(f"获取第 {page_count} 页交易记录失败: {e}")
+                logger.error("获取第 %s 页交易记录失败: %s", page_count, e)
                 break
         
-        # 去重（基于交易ID和时间戳）
-        unique_transactions = []
-        seen_ids = set()
-        seen_timestamps = set()
-        
-        for tx in all_transactions:
-            tx_id = tx.get('id')
-            tx_timestamp = tx.get('timestamp')
-            
-            # 使用ID或时间戳去重
-            identifier = tx_id if tx_id else tx_timestamp
-            if identifier not in seen_ids and identifier not in seen_timestamps:
-                seen_ids.add(tx_id)
-                seen_timestamps.add(tx_timestamp)
-                unique_transactions.append(tx)
+        # 去重（有交易ID时按ID，否则按时间戳），一次遍历且保持首次出现的顺序
+        unique_transactions = list({
+            (tx.get('id') if tx.get('id') is not None else tx.get('timestamp')): tx
+            for tx in all_transactions
+        }.values())
         
         if len(unique_transactions) < len(all_transactions):
-            logger.info(f"去重后剩余 {len(unique_transactions)} 条交易记录（去重前: {len(all_transactions)} 条）")
+            logger.info("去重后剩余 %s 条交易记录（去重前: %s 条）", len(unique_transactions), len(all_transactions))
         
         # 按时间排序
         unique_transactions.sort(key=lambda x: x['timestamp'])
@@ -475,20 +549,46 @@ class BinanceTransactions:
                     # 只有开始日期，使用当前时间作为结束日期
                     end_date = datetime.now(tz=timezone.utc)
             
-            # 转换为毫秒时间戳
+            # 转换为毫秒时间戳；结束时间直接作为请求参数，由服务器只返回所需范围内的K线
             since = int(start_date.timestamp() * 1000)
+            ohlcv_params = {'endTime': int(end_date.timestamp() * 1000)} if end_date else {}
             
-            # 获取BTC/USDT的K线数据（日线）
-            ohlcv = self.exchange.fetch_ohlcv('BTC/USDT', '1d', since=since, limit=1000)
+            # 读取本地缓存的K线数据；缓存覆盖开始日期时只需从缓存的最后一根K线起增量获取
+            # （最后一根K线可能是获取时尚未收盘的当日K线，因此重新获取并覆盖）
+            try:
+                cached = pd.read_parquet(BTC_PRICE_CACHE)
+            except (ImportError, OSError, ValueError):
+                cached = None
+            
+            if cached is not None and not cached.empty and cached.index.min() <= start_date:
+                last_cached = cached.index.max()
+                if end_date and last_cached > pd.Timestamp(end_date).floor('D'):
+                    ohlcv = []  # 缓存中结束日期之后还有K线，说明所需K线均已收盘，无需请求API
+                else:
+                    ohlcv = self.exchange.fetch_ohlcv('BTC/USDT', '1d', since=int(last_cached.timestamp() * 1000), limit=1000, params=ohlcv_params)
+            else:
+                cached = None
+                ohlcv = self.exchange.fetch_ohlcv('BTC/USDT', '1d', since=since, limit=1000, params=ohlcv_params)
             
             # 转换为DataFrame
             df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
             df['datetime'] = pd.to_datetime(df['timestamp'], unit='ms', utc=True)
             df.set_index('datetime', inplace=True)
             
-            # 过滤日期范围
-            if end_date:
-                df = df[df.index <= end_date]
+            # 与缓存合并（同一日期以新获取的数据为准），有新数据时更新缓存
+            if cached is not None:
+                df = pd.concat([cached, df])
+                df = df[~df.index.duplicated(keep='last')].sort_index()
+            if ohlcv:
+                try:
+                    df.to_parquet(BTC_PRICE_CACHE, compression='zstd')
+                except ImportError:
+                    logger.debug("未安装pyarrow，跳过比特币价格缓存")
+                except Exception as e:
+                    logger.warning(f"保存比特币价格缓存失败: {e}")
+            
+            # 截取所需日期范围（合并缓存后可能超出请求范围；索引已排序，按标签切片即可）
+            df = df.loc[start_date:end_date]
             
             logger.info(f"获取到 {len(df)} 天的比特币价格数据")
             logger.info(f"价格范围: {df['close'].min():.2f} - {df['close'].max():.2f} USDT")
@@ -532,6 +632,7 @@ class BinanceTransactions:
                 'symbol': 'BTCUSDT',
                 'interval': '1d',  # 日线数据
                 'startTime': since,
+                'endTime': int(end_date.timestamp() * 1000),  # 由服务器按结束日期截取
                 'limit': 1000  # 最大1000条
             }
             
@@ -539,7 +640,7 @@ class BinanceTransactions:
             response = requests.get(url, params=params, timeout=30)
             response.raise_for_status()
             
-            data = response.json()
+            data = orjson.loads(response.content) if ORJSON_AVAILABLE else response.json()
             
             if not data:
                 logger.warning("币安API返回空数据")
@@ -547,26 +648,13 @@ class BinanceTransactions:
             
             # 转换为DataFrame
             # 币安K线数据格式: [开盘时间, 开盘价, 最高价, 最低价, 收盘价, 成交量, 收盘时间, ...]
-            df = pd.DataFrame(data, columns=[
-                'timestamp', 'open', 'high', 'low', 'close', 'volume',
-                'close_time', 'quote_asset_volume', 'number_of_trades',
-                'taker_buy_base_asset_volume', 'taker_buy_quote_asset_volume', 'ignore'
-            ])
-            
-            # 转换数据类型
-            df['datetime'] = pd.to_datetime(df['timestamp'], unit='ms', utc=True)
-            for col in ['open', 'high', 'low', 'close', 'volume']:
-                df[col] = pd.to_numeric(df[col], errors='coerce')
-            
-            # 设置索引并过滤数据
-            df.set_index('datetime', inplace=True)
-            
-            # 过滤日期范围
-            if end_date:
-                df = df[df.index <= end_date]
-            
-            # 只保留需要的列
-            df = df[['open', 'high', 'low', 'close', 'volume']]
+            # 只取需要的列：价格和成交量字符串一次性转换为float64块，开盘时间转换为int64后作为索引
+            klines = np.asarray(data, dtype=object)
+            df = pd.DataFrame(
+                klines[:, 1:6].astype(np.float64),
+                columns=['open', 'high', 'low', 'close', 'volume'],
+                index=pd.DatetimeIndex(pd.to_datetime(klines[:, 0].astype(np.int64), unit='ms', utc=True), name='datetime')
+            )
             
             # 删除空值
             df = df.dropna()
@@ -597,13 +685,14 @@ class BinanceTransactions:
         # 返回空的DataFrame，强制使用新方法
         return pd.DataFrame()
     
-    def calculate_positions_from_transactions(self, symbol=None, days=30):
+    def calculate_positions_from_transactions(self, symbol=None, days=30, raw_transactions=None):
         """
         基于交易记录计算每日持仓变化（修复版本）
         
         Args:
             symbol (str): 交易对，如'BTC/USDT'
             days (int): 分析天数
+            raw_transactions (list): 已获取的ccxt格式原始交易记录（为None时从2025-4-1起重新获取）
             
         Returns:
             pd.DataFrame: pyfolio格式的持仓数据，包含每日持仓变化
@@ -611,9 +700,10 @@ class BinanceTransactions:
         try:
             logger.info("开始基于交易记录计算每日持仓...")
             
-            # 获取原始交易数据
-            since = int(datetime(2025, 4, 1, tzinfo=timezone.utc).timestamp() * 1000)
-            raw_transactions = self.get_all_transactions(symbol=symbol, since=since)
+            # 没有传入原始交易数据时重新获取
+            if raw_transactions is None:
+                since = int(datetime(2025, 4, 1, tzinfo=timezone.utc).timestamp() * 1000)
+                raw_transactions = self.get_all_transactions(symbol=symbol, since=since)
             
             if not raw_transactions:
                 logger.warning("没有找到交易记录，返回空的持仓数据")
@@ -635,110 +725,49 @@ class BinanceTransactions:
             # 创建日期范围
             date_range = pd.date_range(start=start_date, end=end_date, freq='D', tz='UTC')
             
-            # 预先确定所有涉及的资产
-            all_assets = set(['cash'])  # 包含初始现金，直接使用cash列名
-            for tx in raw_transactions:
-                symbol = tx['symbol']
-                if '/' in symbol:
-                    base_asset, quote_asset = symbol.split('/')
-                    all_assets.add(base_asset)
-                    if quote_asset != 'USDT':
-                        all_assets.add(quote_asset)
-            
-            logger.info(f"涉及的资产: {list(all_assets)}")
-            
-            # 一次性创建完整的DataFrame，避免碎片化
-            positions_data = {asset: [0.0] * len(date_range) for asset in all_assets}
-            positions_df = pd.DataFrame(positions_data, index=date_range)
+            # 交易记录转为(日期, 资产, 数量变化)：买入时base增加、quote减少，卖出时相反；USDT作为cash处理
+            trades = pd.DataFrame({
+                'date': pd.to_datetime([tx['datetime'] for tx in raw_transactions], utc=True, format='ISO8601', cache=True).floor('D'),
+                'symbol': [tx['symbol'] for tx in raw_transactions],
+                'side': [tx['side'] for tx in raw_transactions],
+                'amount': [tx['amount'] for tx in raw_transactions],  # 基础资产的数量
+                'cost': [tx['cost'] for tx in raw_transactions]       # 报价资产的数量
+            })
+            trades = trades[trades['symbol'].str.contains('/', regex=False)]
+            pair = trades['symbol'].str.split('/', n=1, expand=True)
+            sign = np.where(trades['side'] == 'buy', 1.0, -1.0)
+            deltas = pd.concat([
+                pd.DataFrame({'date': trades['date'], 'asset': pair[0], 'delta': sign * trades['amount']}),
+                pd.DataFrame({'date': trades['date'], 'asset': pair[1].replace('USDT', 'cash'), 'delta': -sign * trades['cost']})
+            ], ignore_index=True)
+            
+            # 涉及的资产（包含初始现金，直接使用cash列名）
+            all_assets = ['cash'] + [asset for asset in deltas['asset'].unique() if asset != 'cash']
+            logger.info(f"涉及的资产: {all_assets}")
+            
+            # 每日数量变化，按日期累加得到每日资产数量（不是价值）
+            daily_deltas = (
+                deltas.groupby(['date', 'asset'])['delta'].sum()
+                .unstack(fill_value=0.0)
+                .reindex(index=date_range, columns=all_assets, fill_value=0.0)
+            )
+            quantities = daily_deltas.cumsum()
             
-            # 设置初始现金余额
+            # 现金以初始余额起步且每日不低于0（前一日截断后的余额参与下一日计算）：
+            # 带下限的累加等价于：无下限的累计值 + 截至当日低于下限部分的最大值
             initial_cash = 10000.0
-            positions_df.loc[positions_df.index[0], 'cash'] = initial_cash
-            
-            # 按日期排序交易记录
-            sorted_transactions = sorted(raw_transactions, key=lambda x: x['datetime'])
+            unclamped_cash = initial_cash + quantities['cash']
+            quantities['cash'] = unclamped_cash + (-unclamped_cash).cummax().clip(lower=0.0)
             
-            # 初始化持仓追踪（资产数量，不是价值）
-            current_quantities = {asset: 0.0 for asset in all_assets}
-            current_quantities['cash'] = initial_cash
+            # 每日价格矩阵：现金为1，BTC使用最近日期的收盘价，其他资产使用估算价格；无效价格按0计
+            prices = self._daily_price_matrix(all_assets, date_range, btc_price_df)
             
-            # 逐日处理交易数据
-            for i, date in enumerate(date_range):
-                if i > 0:
-                    # 继承前一天的资产数量（直接继承数量，不需要转换）
-                    prev_date = date_range[i-1]
-                    for asset in all_assets:
-                        if asset == 'cash':
-                            # 现金直接继承数量
-                            current_quantities[asset] = positions_df.iloc[i-1, positions_df.columns.get_loc(asset)]
-                        else:
-                            # 对于非现金资产，直接继承前一天的数量（不需要转换）
-                            # 前一天的positions_df中存储的是价值，但current_quantities应该存储数量
-                            # 所以我们需要维护一个单独的数量追踪器，而不是从价值反推数量
-                            current_quantities[asset] = current_quantities.get(asset, 0.0)
-                
-                # 处理当日的所有交易
-                date_transactions = [tx for tx in sorted_transactions 
-                                   if pd.to_datetime(tx['datetime'], utc=True).date() == date.date()]
-                
-                # 更新资产数量（不是价值）
-                for tx in date_transactions:
-                    symbol = tx['symbol']
-                    side = tx['side']
-                    amount = tx['amount']  # 这是基础资产的数量
-                    cost = tx['cost']      # 这是报价资产的数量
-                    
-                    if '/' in symbol:
-                        base_asset, quote_asset = symbol.split('/')
-                    else:
-                        continue
-                    
-                    # 确保quote_asset是USDT或其他稳定币，如果是USDT我们当作cash处理
-                    if quote_asset == 'USDT':
-                        quote_asset = 'cash'
-                    
-                    # 更新资产数量
-                    if side == 'buy':
-                        # 买入base资产，支付quote资产
-                        current_quantities[base_asset] = current_quantities.get(base_asset, 0) + amount
-                        current_quantities[quote_asset] = current_quantities.get(quote_asset, 0) - cost
-                    else:  # sell
-                        # 卖出base资产，获得quote资产
-                        current_quantities[base_asset] = current_quantities.get(base_asset, 0) - amount
-                        current_quantities[quote_asset] = current_quantities.get(quote_asset, 0) + cost
-                
-                # 计算当日持仓价值并更新DataFrame
-                for asset in all_assets:
-                    quantity = current_quantities.get(asset, 0)
-                    
-                    if asset == 'cash':
-                        # 现金直接使用数量
-                        positions_df.iloc[i, positions_df.columns.get_loc(asset)] = max(0, quantity)
-                    elif asset == 'BTC':
-                        # BTC数量乘以当日价格
-                        if quantity > 0 and date in btc_price_df.index:
-                            btc_price = btc_price_df.loc[date, 'close']
-                            positions_df.iloc[i, positions_df.columns.get_loc(asset)] = quantity * btc_price
-                        elif quantity > 0:
-                            # 使用最近的价格
-                            nearest_date = btc_price_df.index[btc_price_df.index.get_indexer([date], method='nearest')[0]]
-                            btc_price = btc_price_df.loc[nearest_date, 'close']
-                            if np.isfinite(btc_price) and btc_price > 0:
-                                positions_df.iloc[i, positions_df.columns.get_loc(asset)] = quantity * btc_price
-                            else:
-                                positions_df.iloc[i, positions_df.columns.get_loc(asset)] = 0.0
-                        else:
-                            positions_df.iloc[i, positions_df.columns.get_loc(asset)] = 0.0
-                    else:
-                        # 其他资产使用估算价格
-                        if quantity > 0:
-                            estimated_price = self._get_asset_price_estimate(asset)
-                            if np.isfinite(estimated_price) and estimated_price > 0:
-                                positions_df.iloc[i, positions_df.columns.get_loc(asset)] = quantity * estimated_price
-                            else:
-                                positions_df.iloc[i, positions_df.columns.get_loc(asset)] = 0.0
-                        else:
-                            positions_df.iloc[i, positions_df.columns.get_loc(asset)] = 0.0
+            # 持仓价值 = 正的资产数量 × 当日价格，在NumPy数组上一次算出后构建DataFrame
+            positions_df = pd.DataFrame(
+                np.maximum(quantities.to_numpy(), 0.0) * prices,
+                index=date_range,
+                columns=all_assets
+            )
             
             logger.info(f"成功计算 {len(positions_df)} 天的持仓数据")
             logger.info(f"涉及的资产: {list(positions_df.columns)}")
@@ -771,45 +800,38 @@ class BinanceTransactions:
         if not transactions:
             return pd.DataFrame()
         
-        pyfolio_data = []
-        for tx in transactions:
-            # 计算交易金额和数量，卖出时使用负值
-            if tx['side'] == 'sell':
-                txn_volume = -abs(tx['cost'])  # 卖出时交易金额为负
-                txn_shares = -abs(tx['amount'])  # 卖出时交易数量为负
-            else:  # buy
-                txn_volume = abs(tx['cost'])   # 买入时交易金额为正
-                txn_shares = abs(tx['amount'])  # 买入时交易数量为正
-            
-            pyfolio_data.append({
-                'date': pd.to_datetime(tx['datetime'], utc=True),
-                'txn_volume': txn_volume,
-                'txn_shares': txn_shares,
-                'symbol': tx['symbol'],  # 保留symbol信息用于调试
-                'side': tx['side']       # 保留side信息用于调试
-            })
-        
-        df = pd.DataFrame(pyfolio_data)
-        df.set_index('date', inplace=True)
-        df.sort_index(inplace=True)
-        
-        # 移除调试列，只保留pyfolio需要的列
-        pyfolio_df = df[['txn_volume', 'txn_shares']].copy()
+        # 按列提取交易字段，避免逐条构建字典
+        count = len(transactions)
+        sides = np.array([tx['side'] for tx in transactions])
+        costs = np.fromiter((tx['cost'] for tx in transactions), dtype=np.float64, count=count)
+        amounts = np.fromiter((tx['amount'] for tx in transactions), dtype=np.float64, count=count)
+        dates = pd.to_datetime([tx['datetime'] for tx in transactions], utc=True, format='ISO8601', cache=True)
+        
+        # 计算交易金额和数量：买入时为正，卖出时为负
+        sign = np.where(sides == 'sell', -1.0, 1.0)
+        pyfolio_df = pd.DataFrame(
+            {
+                'txn_volume': sign * np.abs(costs),
+                'txn_shares': sign * np.abs(amounts)
+            },
+            index=pd.DatetimeIndex(dates, name='date')
+        ).sort_index()
         
         logger.info(f"转换了 {len(transactions)} 条交易记录")
-        logger.info(f"买入交易: {len(df[df['side'] == 'buy'])} 条")
-        logger.info(f"卖出交易: {len(df[df['side'] == 'sell'])} 条")
+        logger.info(f"买入交易: {int((sides == 'buy').sum())} 条")
+        logger.info(f"卖出交易: {int((sides == 'sell').sum())} 条")
         logger.info(f"交易日期范围: {pyfolio_df.index.min()} 到 {pyfolio_df.index.max()}")
         
         return pyfolio_df
     
-    def positions_to_pyfolio_format(self, positions, transactions_df=None):
+    def positions_to_pyfolio_format(self, positions, transactions_df=None, raw_transactions=None):
         """
         将持仓信息转换为pyfolio格式
         
         Args:
             positions (list): ccxt格式的持仓信息
             transactions_df (pd.DataFrame): 交易数据，用于计算持仓价值
+            raw_transactions (list): 已获取的ccxt格式原始交易记录（为None时重新获取最近30天的记录）
             
         Returns:
             pd.DataFrame: pyfolio格式的持仓数据，每个交易对作为单独的列，包含现金列
@@ -825,34 +847,29 @@ class BinanceTransactions:
             # 从交易数据中提取symbol信息（需要从原始交易数据中获取）
             # 由于新格式只包含txn_volume和txn_shares，我们需要重新获取原始交易数据来提取symbol
             try:
-                # 重新获取原始交易数据以提取symbol信息
-                since = int((datetime.now() - pd.Timedelta(days=30)).timestamp() * 1000)
-                raw_transactions = self.get_all_transactions(since=since)
+                # 没有传入原始交易数据时，重新获取以提取symbol信息
+                if raw_transactions is None:
+                    since = int((datetime.now() - pd.Timedelta(days=30)).timestamp() * 1000)
+                    raw_transactions = self.get_all_transactions(since=since)
                 
-                # 按symbol汇总持仓
-                symbol_positions = {}
-                for tx in raw_transactions:
-                    symbol = tx['symbol']
-                    if symbol not in symbol_positions:
-                        symbol_positions[symbol] = {'amount': 0, 'total_cost': 0}
+                # 按symbol汇总持仓（买入为正，卖出为负）
+                if raw_transactions:
+                    count = len(raw_transactions)
+                    sides = np.array([tx['side'] for tx in raw_transactions])
+                    sign = np.where(sides == 'buy', 1.0, -1.0)
+                    symbol_positions = pd.DataFrame({
+                        'symbol': [tx['symbol'] for tx in raw_transactions],
+                        'amount': sign * np.fromiter((tx['amount'] for tx in raw_transactions), dtype=np.float64, count=count),
+                        'total_cost': sign * np.fromiter((tx['cost'] for tx in raw_transactions), dtype=np.float64, count=count)
+                    }).groupby('symbol', sort=False).sum()
                     
-                    # 根据买卖方向调整持仓
-                    if tx['side'] == 'buy':
-                        symbol_positions[symbol]['amount'] += tx['amount']
-                        symbol_positions[symbol]['total_cost'] += tx['cost']
-                    else:  # sell
-                        symbol_positions[symbol]['amount'] -= tx['amount']
-                        symbol_positions[symbol]['total_cost'] -= tx['cost']
-                
-                # 计算每个symbol的当前持仓价值
-                for symbol, pos_data in symbol_positions.items():
-                    if pos_data['amount'] != 0:
-                        # 使用平均成本作为当前价值的近似
-                        avg_price = pos_data['total_cost'] / pos_data['amount'] if pos_data['amount'] != 0 else 0
-                        current_value = abs(pos_data['amount']) * avg_price
-                        # 使用symbol的基础资产名称作为列名（去掉/USDT等）
-                        base_symbol = symbol.split('/')[0]
-                        positions_data[base_symbol] = current_value
+                    # 计算每个symbol的当前持仓价值（使用平均成本作为当前价值的近似）
+                    symbol_positions = symbol_positions[symbol_positions['amount'] != 0]
+                    avg_price = symbol_positions['total_cost'] / symbol_positions['amount']
+                    current_values = symbol_positions['amount'].abs() * avg_price
+                    # 使用symbol的基础资产名称作为列名（去掉/USDT等）
+                    base_symbols = symbol_positions.index.str.split('/').str[0]
+                    positions_data.update(zip(base_symbols, current_values))
                         
             except Exception as e:
                 logger.warning(f"从交易数据计算持仓失败: {e}")
@@ -882,31 +899,32 @@ class BinanceTransactions:
             # 使用交易数据的日期范围，获取所有唯一的日期
             unique_dates = transactions_df.index.normalize().unique()
             # 按日期排序
-            date_range = pd.DatetimeIndex(sorted(unique_dates))
+            date_range = unique_dates.sort_values()
         else:
             # 如果没有交易数据，使用最近30天的日期范围
             end_date = pd.Timestamp.now(tz='UTC')
             date_range = pd.date_range(start=end_date - pd.Timedelta(days=30), end=end_date, freq='D')
         
-        # 创建positions DataFrame
-        positions_df = pd.DataFrame(index=date_range)
-        
-        # 为每个资产添加持仓价值列
-        for symbol, value in positions_data.items():
-            # 假设持仓在期间保持不变（简化处理）
-            positions_df[symbol] = value
-        
-        # 添加现金列（假设现金余额为0，可以根据实际情况调整）
-        positions_df['cash'] = 0.0
+        # 创建positions DataFrame：假设持仓在期间保持不变（简化处理），
+        # 各资产列和现金列（假设现金余额为0，可以根据实际情况调整）一次性广播为一个连续的数值块
+        columns = list(positions_data) + ['cash']
+        row = np.array(list(positions_data.values()) + [0.0], dtype=np.float64)
+        positions_df = pd.DataFrame(
+            np.broadcast_to(row, (len(date_range), len(columns))).copy(),
+            index=date_range,
+            columns=columns
+        )
         
         return positions_df
     
-    def calculate_returns(self, transactions):
+    def calculate_returns(self, transactions, raw_transactions=None, usdt_flows=None):
         """
         基于仓位和比特币价格计算每日账户净值和收益率序列（考虑USDT转入转出）
         
         Args:
             transactions (pd.DataFrame): 交易数据（只包含txn_volume和txn_shares）
+            raw_transactions (list): 已获取的主要交易对原始交易记录（为None时重新获取）
+            usdt_flows (list): 已获取的USDT转入转出记录（为None时重新获取）
             
         Returns:
             pd.Series: 收益率序列
@@ -932,12 +950,12 @@ class BinanceTransactions:
             logger.warning("无法获取比特币价格数据，使用简化计算方法")
             return self._calculate_simple_returns(transactions, start_date, end_date)
         
-        # 获取原始交易数据以提取symbol和交易方向
+        # 获取原始交易数据以提取symbol和交易方向，以及USDT转入转出记录（已传入时直接使用）
         since = int(start_date.timestamp() * 1000)
-        raw_transactions = self.get_all_transactions(since=since)
-        
-        # 获取USDT转入转出记录
-        usdt_flows = self.get_usdt_deposits_withdrawals(since=since)
+        if raw_transactions is None:
+            raw_transactions = self.get_all_transactions(since=since)
+        if usdt_flows is None:
+            usdt_flows = self.get_usdt_deposits_withdrawals(since=since)
         
         # 计算每日持仓变化（考虑USDT转入转出）
         daily_positions = self._calculate_daily_positions_with_flows(raw_transactions, usdt_flows, start_date, end_date, btc_price_df)
@@ -954,6 +972,96 @@ class BinanceTransactions:
         
         return returns
     
+    def _group_transactions_by_day(self, raw_transactions):
+        """
+        按UTC日期分组交易记录（所有时间字符串一次性解析）
+        
+        Args:
+            raw_transactions (list): 原始交易记录
+            
+        Returns:
+            dict: 日期(datetime.date) -> 当日按时间排序的交易记录列表
+        """
+        sorted_transactions = sorted(raw_transactions, key=lambda x: x['datetime'])
+        days = pd.to_datetime(
+            [tx['datetime'] for tx in sorted_transactions], utc=True, format='ISO8601', cache=True
+        ).date
+        
+        transactions_by_day = {}
+        for day, tx in zip(days, sorted_transactions):
+            transactions_by_day.setdefault(day, []).append(tx)
+        return transactions_by_day
+    
+    def _daily_asset_deltas(self, raw_transactions, date_range, asset_index, usdt_flows=None):
+        """
+        将交易记录（及USDT转入转出）展开为按日期排序的资产数量变化数组
+        
+        Args:
+            raw_transactions (list): 原始交易记录
+            date_range (pd.DatetimeIndex): 日期范围
+            asset_index (dict): 资产 -> 列号（USDT作为cash处理）
+            usdt_flows (list): USDT转入转出记录
+            
+        Returns:
+            tuple: (日期序号, 资产列号, 数量变化) 三个NumPy数组
+        """
+        transactions_by_day = self._group_transactions_by_day(raw_transactions)
+        flows_by_day = {}
+        for flow in sorted(usdt_flows or [], key=lambda x: x['date']):
+            flows_by_day.setdefault(flow['date'].date(), []).append(flow)
+        
+        cash_col = asset_index['cash']
+        delta_day, delta_asset, delta_amount = [], [], []
+        for i, date in enumerate(date_range):
+            day = date.date()
+            for tx in transactions_by_day.get(day, []):
+                symbol = tx['symbol']
+                if '/' not in symbol:
+                    continue
+                base_asset, quote_asset = symbol.split('/')
+                if quote_asset == 'USDT':
+                    quote_asset = 'cash'
+                
+                # 买入base资产、支付quote资产，卖出时相反
+                sign = 1.0 if tx['side'] == 'buy' else -1.0
+                delta_day.extend((i, i))
+                delta_asset.extend((asset_index[base_asset], asset_index[quote_asset]))
+                delta_amount.extend((sign * tx['amount'], -sign * tx['cost']))
+            
+            for flow in flows_by_day.get(day, []):
+                # USDT转入转出直接影响现金余额（转入为正，转出为负）
+                delta_day.append(i)
+                delta_asset.append(cash_col)
+                delta_amount.append(flow['amount'])
+                logger.debug("%s USDT %s: %s", day, flow['type'], flow['amount'])
+        
+        return (
+            np.array(delta_day, dtype=np.int64),
+            np.array(delta_asset, dtype=np.int64),
+            np.array(delta_amount, dtype=np.float64)
+        )
+    
+    def _daily_price_matrix(self, assets, date_range, btc_price_df):
+        """
+        构建每日价格矩阵：现金为1，BTC使用最近日期的收盘价，其他资产使用估算价格；无效价格按0计
+        
+        Args:
+            assets (list): 资产列表
+            date_range (pd.DatetimeIndex): 日期范围
+            btc_price_df (pd.DataFrame): 比特币价格数据
+            
+        Returns:
+            np.ndarray: (天数, 资产数)的价格矩阵
+        """
+        prices = np.tile(
+            np.array([1.0 if asset == 'cash' else self._get_asset_price_estimate(asset) for asset in assets], dtype=np.float64),
+            (len(date_range), 1)
+        )
+        if 'BTC' in assets:
+            prices[:, assets.index('BTC')] = btc_price_df['close'].reindex(date_range, method='nearest').to_numpy()
+        prices[~(np.isfinite(prices) & (prices > 0))] = 0.0
+        return prices
+    
     def _calculate_daily_positions(self, raw_transactions, btc_price_df):
         """
         计算每日持仓变化
@@ -972,29 +1080,24 @@ class BinanceTransactions:
             freq='D'
         )
         
-        positions_df = pd.DataFrame(index=date_range)
+        # 每日BTC和USDT持仓先写入预分配的NumPy数组，最后一次性构建DataFrame
+        btc_holdings = np.zeros(len(date_range))
+        usdt_holdings = np.zeros(len(date_range))
         
-        # 初始化持仓列
-        positions_df['BTC'] = 0.0
-        positions_df['USDT'] = 0.0
-        
-        # 添加初始USDT余额（假设有初始资金）
+        # 初始USDT余额（假设有初始资金）
         initial_usdt = 10000.0  # 默认初始资金
-        positions_df.loc[:, 'USDT'] = initial_usdt
         
         # 按日期处理交易，逐日更新持仓
         current_btc = 0.0
         current_usdt = initial_usdt
         
-        # 先按日期排序交易记录
-        sorted_transactions = sorted(raw_transactions, key=lambda x: x['datetime'])
+        # 先按日期排序并按UTC日期分组交易记录
+        transactions_by_day = self._group_transactions_by_day(raw_transactions)
         
         # 为每个日期处理交易
         for i, date in enumerate(date_range):
             # 处理当日的所有交易
-            date_str = date.strftime('%Y-%m-%d')
-            daily_transactions = [tx for tx in sorted_transactions 
-                                if pd.to_datetime(tx['datetime'], utc=True).date() == date.date()]
+            daily_transactions = transactions_by_day.get(date.date(), [])
             
             # 处理当日每笔交易
             for tx in daily_transactions:
@@ -1021,10 +1124,10 @@ class BinanceTransactions:
                         current_usdt += cost
             
             # 更新当日持仓
-            positions_df.loc[date, 'BTC'] = current_btc
-            positions_df.loc[date, 'USDT'] = current_usdt
+            btc_holdings[i] = current_btc
+            usdt_holdings[i] = current_usdt
         
-        return positions_df
+        return pd.DataFrame({'BTC': btc_holdings, 'USDT': usdt_holdings}, index=date_range)
     
     def _calculate_portfolio_value(self, daily_positions, btc_price_df):
         """
@@ -1037,38 +1140,20 @@ class BinanceTransactions:
         Returns:
             pd.Series: 每日投资组合价值
         """
-        portfolio_values = []
+        # 各资产列的价格一次性对齐到所有日期：USDT为1，BTC使用当日（没有时使用最近日期）的收盘价，其他资产使用估算价格
+        amounts = daily_positions.to_numpy(dtype=np.float64)
+        prices = np.empty_like(amounts)
+        for j, asset in enumerate(daily_positions.columns):
+            if asset == 'USDT':
+                prices[:, j] = 1.0
+            elif asset == 'BTC':
+                prices[:, j] = btc_price_df['close'].reindex(daily_positions.index, method='nearest').to_numpy()
+            else:
+                # 其他资产的简化处理（使用估算价格）
+                prices[:, j] = self._get_asset_price_estimate(asset)
         
-        for date in daily_positions.index:
-            daily_value = 0.0
-            
-            # 获取当日持仓
-            positions = daily_positions.loc[date]
-            
-            # 计算各资产价值
-            for asset, amount in positions.items():
-                if amount == 0:
-                    continue
-                    
-                if asset == 'USDT':
-                    # USDT直接计入价值
-                    daily_value += amount
-                elif asset == 'BTC':
-                    # 获取当日BTC价格
-                    if date in btc_price_df.index:
-                        btc_price = btc_price_df.loc[date, 'close']
-                        daily_value += amount * btc_price
-                    else:
-                        # 如果没有当日价格，使用最近的价格
-                        nearest_date = btc_price_df.index[btc_price_df.index.get_indexer([date], method='nearest')[0]]
-                        btc_price = btc_price_df.loc[nearest_date, 'close']
-                        daily_value += amount * btc_price
-                else:
-                    # 其他资产的简化处理（使用估算价格）
-                    estimated_price = self._get_asset_price_estimate(asset)
-                    daily_value += amount * estimated_price
-            
-            portfolio_values.append(daily_value)
+        # 数量为0的资产不计入当日价值
+        portfolio_values = np.where(amounts != 0, amounts * prices, 0.0).sum(axis=1)
         
         return pd.Series(portfolio_values, index=daily_positions.index)
     
@@ -1190,129 +1275,22 @@ class BinanceTransactions:
                 if quote_asset != 'USDT':
                     all_assets.add(quote_asset)
         
-        # 创建DataFrame
-        positions_df = pd.DataFrame(0.0, index=date_range, columns=list(all_assets))
+        # 资产映射为列号，交易展开为按日期排序的数量变化数组，每日价格整理为矩阵，
+        # 逐日推演持仓数量和价值交给数值内核完成（安装numba时JIT编译）
+        asset_columns = list(all_assets)
+        asset_index = {asset: j for j, asset in enumerate(asset_columns)}
+        delta_day, delta_asset, delta_amount = self._daily_asset_deltas(raw_transactions, date_range, asset_index)
+        prices = self._daily_price_matrix(asset_columns, date_range, btc_price_df)
+        values = _walk_daily_positions(delta_day, delta_asset, delta_amount, prices, asset_index['cash'], 10000.0)
         
-        # 初始化持仓追踪（资产数量，不是价值）
-        quantities = {asset: 0.0 for asset in all_assets}
-        quantities['cash'] = 10000.0  # 初始现金
+        # 检查无穷大值并替换为0，NaN值同样置为0（直接在NumPy数组上原地处理，无需再对整个DataFrame做fillna）
+        inf_counts = np.isinf(values).sum(axis=0)
+        for asset, inf_count in zip(asset_columns, inf_counts):
+            if inf_count > 0:
+                logger.warning(f"{asset}列有 {inf_count} 个无穷大值，已替换为0")
+        values[~np.isfinite(values)] = 0.0
         
-        # 设置初始现金余额
-        positions_df.loc[positions_df.index[0], 'cash'] = 10000.0
-        
-        # 按日期排序交易记录
-        sorted_transactions = sorted(raw_transactions, key=lambda x: x['datetime'])
-        
-        # 逐日处理交易
-        for i, date in enumerate(date_range):
-            if i > 0:
-                # 继承前一天的资产数量（直接继承，不需要转换）
-                # 前一天的positions_df存储的是价值，但quantities应该存储数量
-                # 所以我们需要从价值反推数量
-                prev_date = date_range[i-1]
-                for asset in all_assets:
-                    if asset == 'cash':
-                        # 现金直接继承数量
-                        quantities[asset] = positions_df.iloc[i-1, positions_df.columns.get_loc(asset)]
-                    else:
-                        # 对于非现金资产，需要从价值转换为数量
-                        prev_value = positions_df.iloc[i-1, positions_df.columns.get_loc(asset)]
-                        if prev_value > 0:
-                            if asset == 'BTC':
-                                if prev_date in btc_price_df.index:
-                                    btc_price = btc_price_df.loc[prev_date, 'close']
-                                else:
-                                    nearest_date = btc_price_df.index[btc_price_df.index.get_indexer([prev_date], method='nearest')[0]]
-                                    btc_price = btc_price_df.loc[nearest_date, 'close']
-                                if np.isfinite(btc_price) and btc_price > 0:
-                                    quantities[asset] = prev_value / btc_price
-                                else:
-                                    quantities[asset] = 0.0
-                            else:
-                                # 其他资产使用估算价格转换为数量
-                                estimated_price = self._get_asset_price_estimate(asset)
-                                if np.isfinite(estimated_price) and estimated_price > 0:
-                                    quantities[asset] = prev_value / estimated_price
-                                else:
-                                    quantities[asset] = 0.0
-                        else:
-                            quantities[asset] = 0.0
-            
-            # 处理当日的所有交易
-            daily_transactions = [tx for tx in sorted_transactions 
-                                if pd.to_datetime(tx['datetime'], utc=True).date() == date.date()]
-            
-            # 更新资产数量（不是价值）
-            for tx in daily_transactions:
-                symbol = tx['symbol']
-                side = tx['side']
-                amount = tx['amount']  # 这是基础资产的数量
-                cost = tx['cost']      # 这是报价资产的数量
-                
-                if '/' in symbol:
-                    base_asset, quote_asset = symbol.split('/')
-                else:
-                    continue
-                
-                # 确保quote_asset是USDT或其他稳定币，如果是USDT我们当作cash处理
-                if quote_asset == 'USDT':
-                    quote_asset = 'cash'
-                
-                # 更新资产数量
-                if side == 'buy':
-                    # 买入base资产，支付quote资产
-                    quantities[base_asset] = quantities.get(base_asset, 0) + amount
-                    quantities[quote_asset] = quantities.get(quote_asset, 0) - cost
-                else:  # sell
-                    # 卖出base资产，获得quote资产
-                    quantities[base_asset] = quantities.get(base_asset, 0) - amount
-                    quantities[quote_asset] = quantities.get(quote_asset, 0) + cost
-            
-            # 计算当日持仓价值并更新DataFrame
-            for asset in all_assets:
-                quantity = quantities.get(asset, 0)
-                
-                if asset == 'cash':
-                    # 现金直接使用数量
-                    positions_df.iloc[i, positions_df.columns.get_loc(asset)] = max(0, quantity)
-                elif asset == 'BTC':
-                    # BTC数量乘以当日价格
-                    if quantity > 0 and date in btc_price_df.index:
-                        btc_price = btc_price_df.loc[date, 'close']
-                        if np.isfinite(btc_price) and btc_price > 0:
-                            positions_df.iloc[i, positions_df.columns.get_loc(asset)] = quantity * btc_price
-                        else:
-                            positions_df.iloc[i, positions_df.columns.get_loc(asset)] = 0.0
-                    elif quantity > 0:
-                        # 使用最近的价格
-                        nearest_date = btc_price_df.index[btc_price_df.index.get_indexer([date], method='nearest')[0]]
-                        btc_price = btc_price_df.loc[nearest_date, 'close']
-                        if np.isfinite(btc_price) and btc_price > 0:
-                            positions_df.iloc[i, positions_df.columns.get_loc(asset)] = quantity * btc_price
-                        else:
-                            positions_df.iloc[i, positions_df.columns.get_loc(asset)] = 0.0
-                    else:
-                        positions_df.iloc[i, positions_df.columns.get_loc(asset)] = 0.0
-                else:
-                    # 其他资产使用估算价格
-                    if quantity > 0:
-                        estimated_price = self._get_asset_price_estimate(asset)
-                        if np.isfinite(estimated_price) and estimated_price > 0:
-                            positions_df.iloc[i, positions_df.columns.get_loc(asset)] = quantity * estimated_price
-                        else:
-                            positions_df.iloc[i, positions_df.columns.get_loc(asset)] = 0.0
-                    else:
-                        positions_df.iloc[i, positions_df.columns.get_loc(asset)] = 0.0
-        
-        # 检查无穷大值并替换为0
-        for asset in positions_df.columns:
-            inf_mask = np.isinf(positions_df[asset])
-            if inf_mask.any():
-                logger.warning(f"{asset}列有 {inf_mask.sum()} 个无穷大值，已替换为0")
-                positions_df.loc[inf_mask, asset] = 0.0
-        
-        # 填充NaN值为0
-        positions_df = positions_df.fillna(0.0)
+        positions_df = pd.DataFrame(values, index=date_range, columns=asset_columns)
         
         return positions_df
     
@@ -1343,139 +1321,22 @@ class BinanceTransactions:
                 if quote_asset != 'USDT':
                     all_assets.add(quote_asset)
         
-        # 创建DataFrame
-        positions_df = pd.DataFrame(0.0, index=date_range, columns=list(all_assets))
+        # 资产映射为列号，交易和USDT转入转出展开为按日期排序的数量变化数组，每日价格整理为矩阵，
+        # 逐日推演持仓数量和价值交给数值内核完成（安装numba时JIT编译）
+        asset_columns = list(all_assets)
+        asset_index = {asset: j for j, asset in enumerate(asset_columns)}
+        delta_day, delta_asset, delta_amount = self._daily_asset_deltas(raw_transactions, date_range, asset_index, usdt_flows)
+        prices = self._daily_price_matrix(asset_columns, date_range, btc_price_df)
+        values = _walk_daily_positions(delta_day, delta_asset, delta_amount, prices, asset_index['cash'], 10000.0)
         
-        # 初始化持仓追踪（资产数量，不是价值）
-        quantities = {asset: 0.0 for asset in all_assets}
-        quantities['cash'] = 10000.0  # 初始现金
+        # 检查无穷大值并替换为0，NaN值同样置为0（直接在NumPy数组上原地处理，无需再对整个DataFrame做fillna）
+        inf_counts = np.isinf(values).sum(axis=0)
+        for asset, inf_count in zip(asset_columns, inf_counts):
+            if inf_count > 0:
+                logger.warning(f"{asset}列有 {inf_count} 个无穷大值，已替换为0")
+        values[~np.isfinite(values)] = 0.0
         
-        # 设置初始现金余额
-        positions_df.loc[positions_df.index[0], 'cash'] = 10000.0
-        
-        # 按日期排序交易记录
-        sorted_transactions = sorted(raw_transactions, key=lambda x: x['datetime'])
-        
-        # 按日期排序USDT转入转出记录
-        sorted_usdt_flows = sorted(usdt_flows, key=lambda x: x['date'])
-        
-        # 逐日处理交易
-        for i, date in enumerate(date_range):
-            if i > 0:
-                # 继承前一天的资产数量（直接继承，不需要转换）
-                prev_date = date_range[i-1]
-                for asset in all_assets:
-                    if asset == 'cash':
-                        # 现金直接继承数量
-                        quantities[asset] = positions_df.iloc[i-1, positions_df.columns.get_loc(asset)]
-                    else:
-                        # 对于非现金资产，需要从价值转换为数量
-                        prev_value = positions_df.iloc[i-1, positions_df.columns.get_loc(asset)]
-                        if prev_value > 0:
-                            if asset == 'BTC':
-                                if prev_date in btc_price_df.index:
-                                    btc_price = btc_price_df.loc[prev_date, 'close']
-                                else:
-                                    nearest_date = btc_price_df.index[btc_price_df.index.get_indexer([prev_date], method='nearest')[0]]
-                                    btc_price = btc_price_df.loc[nearest_date, 'close']
-                                if np.isfinite(btc_price) and btc_price > 0:
-                                    quantities[asset] = prev_value / btc_price
-                                else:
-                                    quantities[asset] = 0.0
-                            else:
-                                # 其他资产使用估算价格转换为数量
-                                estimated_price = self._get_asset_price_estimate(asset)
-                                if np.isfinite(estimated_price) and estimated_price > 0:
-                                    quantities[asset] = prev_value / estimated_price
-                                else:
-                                    quantities[asset] = 0.0
-                        else:
-                            quantities[asset] = 0.0
-            
-            # 处理当日的所有交易
-            daily_transactions = [tx for tx in sorted_transactions 
-                                if pd.to_datetime(tx['datetime'], utc=True).date() == date.date()]
-            
-            # 更新资产数量（不是价值）
-            for tx in daily_transactions:
-                symbol = tx['symbol']
-                side = tx['side']
-                amount = tx['amount']  # 这是基础资产的数量
-                cost = tx['cost']      # 这是报价资产的数量
-                
-                if '/' in symbol:
-                    base_asset, quote_asset = symbol.split('/')
-                else:
-                    continue
-                
-                # 确保quote_asset是USDT或其他稳定币，如果是USDT我们当作cash处理
-                if quote_asset == 'USDT':
-                    quote_asset = 'cash'
-                
-                # 更新资产数量
-                if side == 'buy':
-                    # 买入base资产，支付quote资产
-                    quantities[base_asset] = quantities.get(base_asset, 0) + amount
-                    quantities[quote_asset] = quantities.get(quote_asset, 0) - cost
-                else:  # sell
-                    # 卖出base资产，获得quote资产
-                    quantities[base_asset] = quantities.get(base_asset, 0) - amount
-                    quantities[quote_asset] = quantities.get(quote_asset, 0) + cost
-            
-            # 处理当日的USDT转入转出
-            daily_usdt_flows = [flow for flow in sorted_usdt_flows 
-                              if flow['date'].date() == date.date()]
-            
-            for flow in daily_usdt_flows:
-                # USDT转入转出直接影响现金余额
-                quantities['cash'] += flow['amount']  # 转入为正，转出为负
-                logger.debug(f"{date.strftime('%Y-%m-%d')} USDT {flow['type']}: {flow['amount']}")
-            
-            # 计算当日持仓价值并更新DataFrame
-            for asset in all_assets:
-                quantity = quantities.get(asset, 0)
-                
-                if asset == 'cash':
-                    # 现金直接使用数量
-                    positions_df.iloc[i, positions_df.columns.get_loc(asset)] = max(0, quantity)
-                elif asset == 'BTC':
-                    # BTC数量乘以当日价格
-                    if quantity > 0 and date in btc_price_df.index:
-                        btc_price = btc_price_df.loc[date, 'close']
-                        if np.isfinite(btc_price) and btc_price > 0:
-                            positions_df.iloc[i, positions_df.columns.get_loc(asset)] = quantity * btc_price
-                        else:
-                            positions_df.iloc[i, positions_df.columns.get_loc(asset)] = 0.0
-                    elif quantity > 0:
-                        # 使用最近的价格
-                        nearest_date = btc_price_df.index[btc_price_df.index.get_indexer([date], method='nearest')[0]]
-                        btc_price = btc_price_df.loc[nearest_date, 'close']
-                        if np.isfinite(btc_price) and btc_price > 0:
-                            positions_df.iloc[i, positions_df.columns.get_loc(asset)] = quantity * btc_price
-                        else:
-                            positions_df.iloc[i, positions_df.columns.get_loc(asset)] = 0.0
-                    else:
-                        positions_df.iloc[i, positions_df.columns.get_loc(asset)] = 0.0
-                else:
-                    # 其他资产使用估算价格
-                    if quantity > 0:
-                        estimated_price = self._get_asset_price_estimate(asset)
-                        if np.isfinite(estimated_price) and estimated_price > 0:
-                            positions_df.iloc[i, positions_df.columns.get_loc(asset)] = quantity * estimated_price
-                        else:
-                            positions_df.iloc[i, positions_df.columns.get_loc(asset)] = 0.0
-                    else:
-                        positions_df.iloc[i, positions_df.columns.get_loc(asset)] = 0.0
-        
-        # 检查无穷大值并替换为0
-        for asset in positions_df.columns:
-            inf_mask = np.isinf(positions_df[asset])
-            if inf_mask.any():
-                logger.warning(f"{asset}列有 {inf_mask.sum()} 个无穷大值，已替换为0")
-                positions_df.loc[inf_mask, asset] = 0.0
-        
-        # 填充NaN值为0
-        positions_df = positions_df.fillna(0.0)
+        positions_df = pd.DataFrame(values, index=date_range, columns=asset_columns)
         
         return positions_df
     
@@ -1504,61 +1365,37 @@ class BinanceTransactions:
         # 创建完整的日期范围
         date_range = pd.date_range(start=start_date, end=end_date, freq='D', tz='UTC')
         
-        # 按日期排序交易
-        transactions_sorted = transactions.sort_index()
-        
-        # 创建收益率序列
-        returns = pd.Series(index=date_range, dtype=float)
+        # 按日汇总交易量（交易量已经包含买卖方向，正负值）
+        daily_pnl = (
+            transactions['txn_volume']
+            .groupby(transactions.index.floor('D'))
+            .sum()
+            .reindex(date_range, fill_value=0.0)
+            .to_numpy(dtype=np.float64)
+        )
         
-        # 初始化投资组合价值追踪
+        # 投资组合价值 = 初始价值 + 累计交易量，且不低于1000（避免变成负数或过小）
+        # 带下限的累加等价于：无下限的累计值 + 截至当日低于下限部分的最大值
         initial_portfolio_value = 10000.0  # 初始价值
-        current_portfolio_value = initial_portfolio_value
-        previous_portfolio_value = initial_portfolio_value
+        min_portfolio_value = 1000.0
+        unclamped = initial_portfolio_value + np.cumsum(daily_pnl)
+        portfolio_values = unclamped + np.maximum(np.maximum.accumulate(min_portfolio_value - unclamped), 0.0)
         
-        # 为每个日期计算收益率
-        for i, date in enumerate(date_range):
-            # 获取当日交易
-            daily_transactions = pd.DataFrame()
-            if date in transactions_sorted.index:
-                daily_data = transactions_sorted.loc[date]
-                if isinstance(daily_data, pd.Series):
-                    daily_transactions = pd.DataFrame([daily_data])
-                else:
-                    daily_transactions = daily_data
-            
-            # 计算当日价值变化（基于交易量）
-            daily_pnl = 0.0
-            if not daily_transactions.empty:
-                # 交易量已经包含买卖方向（正负值）
-                daily_pnl = daily_transactions['txn_volume'].sum()
-            
-            # 更新投资组合价值
-            previous_portfolio_value = current_portfolio_value
-            current_portfolio_value += daily_pnl
-            
-            # 确保投资组合价值不会变成负数或过小
-            current_portfolio_value = max(current_portfolio_value, 1000.0)
-            
-            # 计算收益率
-            if i == 0:
-                returns.loc[date] = 0.0  # 第一天收益率为0
-            else:
-                if previous_portfolio_value > 0:
-                    daily_return = (current_portfolio_value - previous_portfolio_value) / previous_portfolio_value
-                    # 限制收益率在合理范围内（-20% 到 +20%）
-                    daily_return = max(min(daily_return, 0.2), -0.2)
-                    returns.loc[date] = daily_return
-                else:
-                    returns.loc[date] = 0.0
+        # 计算收益率（第一天收益率为0），并限制在合理范围内（-20% 到 +20%）
+        daily_returns = np.zeros(len(date_range))
+        daily_returns[1:] = np.clip(portfolio_values[1:] / portfolio_values[:-1] - 1, -0.2, 0.2)
+        returns = pd.Series(daily_returns, index=date_range)
         
         logger.info(f"简化收益率计算完成，数据范围: {returns.index.min()} 到 {returns.index.max()}")
         logger.info(f"收益率统计: 最小值 {returns.min():.6f}, 最大值 {returns.max():.6f}, 平均值 {returns.mean():.6f}")
         
-        return returns.fillna(0.0)
+        return returns
     
     def save_to_csv(self, data, filename):
         """
-        保存数据到CSV文件
+        保存数据到CSV文件，并同时保存同名的Parquet文件
+        
+        Parquet文件原样保留列类型和带时区的日期索引，后续分析脚本可直接读取，无需重新解析CSV
         
         Args:
             data (pd.DataFrame): 要保存的数据
@@ -1569,6 +1406,16 @@ class BinanceTransactions:
             logger.info(f"数据已保存到 {filename}")
         except Exception as e:
             logger.error(f"保存文件失败: {e}")
+            return
+        
+        parquet_filename = os.path.splitext(filename)[0] + '.parquet'
+        try:
+            data.to_parquet(parquet_filename, engine='pyarrow', compression='zstd')
+            logger.info(f"数据已保存到 {parquet_filename}")
+        except ImportError:
+            logger.debug("未安装pyarrow，跳过Parquet文件保存")
+        except Exception as e:
+            logger.warning(f"保存Parquet文件失败: {e}")
     
     def get_usdt_deposits_withdrawals(self, since=None):
         """
@@ -1678,7 +1525,7 @@ class BinanceTransactions:
         
         # 使用新的方法计算每日持仓变化
         logger.info("使用新的方法计算每日持仓变化...")
-        positions_df = self.calculate_positions_from_transactions(symbol=symbol, days=days)
+        positions_df = self.calculate_positions_from_transactions(symbol=symbol, days=days, raw_transactions=transactions)
         
         # 如果新方法失败，回退到旧方法
         if positions_df.empty:
@@ -1686,11 +1533,16 @@ class BinanceTransactions:
             if balance_data:
                 positions_df = self.balance_to_pyfolio_format(balance_data, transactions_df)
             else:
-                positions_df = self.positions_to_pyfolio_format(None, transactions_df)
+                positions_df = self.positions_to_pyfolio_format(None, transactions_df, raw_transactions=transactions)
         else:
             logger.info("新方法成功计算持仓数据")
         
-        returns_series = self.calculate_returns(transactions_df)
+        # 收益率基于主要交易对计算：未指定交易对时与上面获取的交易记录相同，直接复用
+        returns_series = self.calculate_returns(
+            transactions_df,
+            raw_transactions=transactions if not symbol else None,
+            usdt_flows=usdt_flows
+        )
         
         # 保存数据
         if not transactions_df.empty:
@@ -20,13 +20,13 @@ print(f"持仓数据范围: {positions_df.index.min()} 到 {positions_df.index.m
 
 # 找出极端收益率值
 extreme_threshold = 10  # 超过1000%的收益率
-extreme_returns = returns_df[abs(returns_df['return']) > extreme_threshold].copy()
+extreme_returns = returns_df.loc[abs(returns_df['return']) > extreme_threshold, 'return']
 
 print(f"=== 发现 {len(extreme_returns)} 个极端收益率值（绝对值 > {extreme_threshold}） ===\n")
 
-for date, row in extreme_returns.iterrows():
+for date, ret in extreme_returns.items():
     print(f"日期: {date.strftime('%Y-%m-%d')}")
-    print(f"  收益率: {row['return']:.6f} ({row['return']*100:.2f}%)")
+    print(f"  收益率: {ret:.6f} ({ret*100:.2f}%)")
     
     # 获取前一天的日期
     prev_date = date - pd.Timedelta(days=1)
@@ -58,14 +58,14 @@ for date, row in extreme_returns.iterrows():
         if prev_total > 0:
             calculated_return = (current_total - prev_total) / prev_total
             print(f"  手动计算收益率: {calculated_return:.6f} ({calculated_return*100:.2f}%)")
-            print(f"  与记录的差异: {abs(calculated_return - row['return']):.6f}")
+            print(f"  与记录的差异: {abs(calculated_return - ret):.6f}")
     
     # 检查当天的交易
     day_transactions = transactions_df[transactions_df['date'].dt.date == date.date()]
     if len(day_transactions) > 0:
         print(f"  当日交易数量: {len(day_transactions)}")
-        for _, trans in day_transactions.iterrows():
-            print(f"    {trans['symbol']} {trans['side']}: {trans['amount']:.6f} @ {trans['price']:.2f}")
+        for trans in day_transactions.itertuples(index=False):
+            print(f"    {trans.symbol} {trans.side}: {trans.amount:.6f} @ {trans.price:.2f}")
     
     print()
 
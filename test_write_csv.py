@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试pyfolio CSV写出：pyarrow写出器的输出必须与to_csv(float_format='%.8f')逐字节一致（不需要API密钥）
+"""
+
+import os
+import sys
+import tempfile
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+# 添加当前目录到路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import analysis_binance_transactions_3 as analysis
+
+
+def build_frames():
+    """构建与三个pyfolio CSV写出调用相同结构的测试数据"""
+    dates = [date(2025, 1, 2), date(2025, 1, 3), date(2025, 1, 4)]
+
+    transactions = pd.DataFrame(
+        {'txn_volume': [1.0, -1234.56789012345, 0.1], 'txn_shares': [0.02, -0.0, np.nan]},
+        index=pd.Index(dates, name='date')
+    )
+    positions = pd.DataFrame(
+        {'BTC': [0.0, 61502.1968028, 95000.0], 'cash': np.array([53654.4299, 0.0, 1e-9], dtype=np.float32)},
+        index=pd.Index(dates, name='date')
+    )
+    returns = pd.DataFrame(
+        {'returns': [0.14626503193541507, 0.0004718144831972193, -0.2]},
+        index=pd.DatetimeIndex(pd.to_datetime(dates), name='date')
+    )
+    unnamed = pd.DataFrame({'value': [1, 2, 3]}, index=pd.date_range('2025-01-01', periods=3, freq='D'))
+    return {
+        'transactions': transactions,
+        'positions': positions,
+        'returns': returns,
+        'unnamed_index': unnamed,
+    }
+
+
+def test_write_csv_matches_to_csv():
+    """逐个比较_write_csv与to_csv的输出字节"""
+    print("=== 测试CSV写出一致性 ===")
+    print(f"pyarrow可用: {analysis.PYARROW_AVAILABLE}")
+
+    success = True
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name, df in build_frames().items():
+            written_path = os.path.join(tmp_dir, f'{name}_written.csv')
+            expected_path = os.path.join(tmp_dir, f'{name}_expected.csv')
+
+            analysis._write_csv(df, written_path)
+            df.to_csv(expected_path, float_format='%.8f')
+
+            with open(written_path, 'rb') as f:
+                written = f.read()
+            with open(expected_path, 'rb') as f:
+                expected = f.read()
+
+            if written == expected:
+                print(f"✓ {name}: 输出一致")
+            else:
+                success = False
+                print(f"✗ {name}: 输出不一致")
+                print(f"  _write_csv: {written!r}")
+                print(f"  to_csv:     {expected!r}")
+
+    return success
+
+
+def main():
+    """主测试函数"""
+    success = test_write_csv_matches_to_csv()
+    print("\n🎉 CSV写出一致性测试通过！" if success else "\n⚠️  CSV写出一致性测试失败")
+    return success
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)